@@ -12,10 +12,20 @@ http://archive.ics.uci.edu/ml/datasets/Adult
 # LIBRARIES
 from itertools import combinations
 from collections import defaultdict
+import binascii
 import datetime
+import glob
+import hashlib
+import marshal
+import math
 import matplotlib.pyplot as plt
+import multiprocessing
 import numpy as np
+import os
+import random
+import struct
 import urllib2
+import zlib
 
 ##################################################################
 # SUPPORTING FUNCTIONS
@@ -89,19 +99,62 @@ def workhour_bins(workhour):
         elif int(workhour) > 40:
             return 'overtime'
 
+def encode_transactions(transactions,item_ids=None,item_names=None):
+    '''Map every item to a dense integer id. Return the transactions
+    as sorted lists of ids and the list of item names indexed by id
+    
+    param:
+    transactions: transaction data base of item names
+    item_ids, item_names: mapping of an earlier call to extend, so that
+    several batches of transactions share the same ids
+    '''
+    if item_ids is None:
+        item_ids = {}
+        item_names = []
+    encoded = []
+    for transaction in transactions:
+        temp = []
+        for item in transaction:
+            if item not in item_ids:
+                item_ids[item] = len(item_names)
+                item_names.append(item)
+            temp.append(item_ids[item])
+        temp.sort()
+        encoded.append(temp)
+    return encoded, item_names
+
+def dedup_transactions(transactions):
+    '''Collapse identical transactions into (transaction, count) pairs
+    
+    param:
+    transactions: transaction data base
+    '''
+    counts = defaultdict(int)
+    order = []
+    for transaction in transactions:
+        key = tuple(sorted(transaction))
+        if key not in counts:
+            order.append(key)
+        counts[key] += 1
+    return [(list(key), counts[key]) for key in order]
+
+def decode_itemset(itemset,item_names):
+    '''Return the names of the items in an encoded itemset
+    '''
+    return [item_names[item] for item in sorted(itemset)]
+
 def has_infrequent_subset(a_set,itemsets):
     '''Checking if there is a subset of an itemset a_set that is 
     infrequent
     
     param: 
     a_set: the set being examined
-    itemsets: list of frequent (k-1)-itemsets
+    itemsets: set of frequent (k-1)-itemsets as frozensets
     '''
-    val = False
     for combination in combinations(a_set,len(a_set)-1):
-        if set(combination) not in itemsets:
-                val = True
-    return val
+        if frozenset(combination) not in itemsets:
+            return True
+    return False
         
     
 def apriori_gen(itemsets):
@@ -110,93 +163,1489 @@ def apriori_gen(itemsets):
     param:
     itemsets: frequent k-itemsets
     '''
-    sets = itemsets.keys()
+    sets = sorted(tuple(sorted(itemset)) for itemset in itemsets)
+    frequent = set(frozenset(itemset) for itemset in sets)
     new_itemsets = []
     k = len(sets[0])  # length of the itemsets
     # making sure all the itemsets have the same length
     assert(all(len(itemset) == k for itemset in sets))
-    for idx, itemset in enumerate(sets):
-        k_minus_one = sorted(itemset)[:k-1]
-        for i in range(idx+1,len(sets)):
-            if k_minus_one == sorted(sets[i])[:k-1]:
-                union = set(sets[idx]).union(set(sets[i]))
+    # Only itemsets sharing their first k-1 items can be joined, group
+    # the sorted itemsets by that prefix
+    groups = defaultdict(list)
+    for itemset in sets:
+        groups[itemset[:-1]].append(itemset[-1])
+    for prefix, last_items in groups.iteritems():
+        for idx, item in enumerate(last_items):
+            for other in last_items[idx+1:]:
+                union = prefix + (item, other)
                 #prune itemsets
-                if not(has_infrequent_subset(union,sets)):
-                    new_itemsets.append(union)
+                if not(has_infrequent_subset(union,frequent)):
+                    new_itemsets.append(frozenset(union))
                 
     return new_itemsets
 
 
-def prune_itemsets(itemsets,min_sup,transactions):
+def hash_pairs(transaction,count,buckets):
+    ''' DHP: hash every pair of items of a transaction into a bucket 
+    and add the transaction count to that bucket
+    
+    param:
+    transaction: a transaction
+    count: number of times the transaction occurs
+    buckets: list of bucket counts
+    '''
+    for pair in combinations(sorted(transaction),2):
+        buckets[hash(pair) % len(buckets)] += count
+
+def dhp_prune(itemsets,buckets,min_sup,n_transactions):
+    ''' DHP: remove candidate 2-itemsets whose bucket count does not 
+    meet min_sup, since no pair in such a bucket can be frequent. Return
+    the remaining candidates and the number of pruned ones
+    
+    param:
+    itemsets: candidate 2-itemsets
+    buckets: list of bucket counts filled by hash_pairs
+    min_sup: minimum support value of a frequent itemset
+    n_transactions: number of transactions in the data base
+    '''
+    kept = []
+    for itemset in itemsets:
+        bucket = hash(tuple(sorted(itemset))) % len(buckets)
+        if float(buckets[bucket])/n_transactions >= min_sup:
+            kept.append(itemset)
+    return kept, len(itemsets) - len(kept)
+
+def prune_itemsets(itemsets,min_sup,n_transactions):
     ''' Remove itemsets that do not meet the min_sup
     
     param:
     itemsets: itemset being examined
-    transaction: list of all transactions
     min_sup: minimum support value of a frequent itemset 
+    n_transactions: number of transactions in the data base
     '''
     for itemset, f in itemsets.items():
-        if float(f)/len(transactions) < min_sup:
+        if float(f)/n_transactions < min_sup:
             del itemsets[itemset] 
     
-def generate_itemsets(itemsets_list, min_sup, transactions):
+def count_horizontal(itemsets,transactions):
+    ''' Count the support of each candidate itemset by scanning
+    the transaction data base
+    
+    param:
+    itemsets: candidate itemsets
+    transactions: list of (transaction, count) pairs
+    '''
+    temp = defaultdict(int)
+    for itemset in itemsets:
+        for transaction, count in transactions:
+            if itemset.issubset(transaction):
+                temp[frozenset(itemset)] += count
+    return temp
+
+def build_candidate_trie(itemsets,key=frozenset):
+    ''' Build a prefix trie of the candidate itemsets. Every itemset 
+    is stored as a path of its sorted items, the last node of the path
+    holds the key the itemset is counted under
+    
+    param:
+    itemsets: candidate itemsets of the same length
+    key: function returning the key of an itemset
+    '''
+    trie = {}
+    for itemset in itemsets:
+        items = sorted(itemset)
+        node = trie
+        for item in items[:-1]:
+            node = node.setdefault(item,{})
+        node[items[-1]] = key(itemset)
+    return trie
+
+def count_subsets(node,items,start,k,counts,weight=1):
+    ''' Walk the candidate trie along the sorted items of a transaction
+    and increment the count of every candidate k-subset it contains
+    
+    param:
+    node: current node of the candidate trie
+    items: sorted items of the transaction
+    start: position in items to continue from
+    k: number of items still needed to reach a candidate
+    counts: dictionary of candidate counts
+    weight: number of times the transaction occurs
+    '''
+    for i in range(start,len(items)-k+1):
+        child = node.get(items[i])
+        if child is None:
+            continue
+        if k == 1:
+            counts[child] += weight
+        else:
+            count_subsets(child,items,i+1,k-1,counts,weight)
+
+def count_trie(itemsets,transactions):
+    ''' Count the support of each candidate itemset by walking every 
+    transaction once through a prefix trie of the candidates
+    
+    param:
+    itemsets: candidate itemsets
+    transactions: list of (transaction, count) pairs
+    '''
+    temp = defaultdict(int)
+    if len(itemsets) == 0:
+        return temp
+    k = len(itemsets[0])
+    trie = build_candidate_trie(itemsets)
+    # Items that are not part of any candidate can be skipped
+    candidate_items = set()
+    for itemset in itemsets:
+        candidate_items.update(itemset)
+    for transaction, count in transactions:
+        items = sorted(item for item in transaction 
+                       if item in candidate_items)
+        if len(items) >= k:
+            count_subsets(trie,items,0,k,temp,count)
+    return temp
+
+def prefix_candidates(itemsets):
+    ''' Yield the candidate (k+1)-itemsets of apriori_gen as sorted 
+    tuples in lexicographic order, one prefix group at a time, without
+    building the list of all candidates
+    
+    param:
+    itemsets: frequent k-itemsets
+    '''
+    groups = defaultdict(list)
+    for itemset in itemsets:
+        items = tuple(sorted(itemset))
+        groups[items[:-1]].append(items[-1])
+    for prefix in sorted(groups):
+        last_items = sorted(groups[prefix])
+        for idx, item in enumerate(last_items):
+            for other in last_items[idx+1:]:
+                union = prefix + (item, other)
+                if not(has_infrequent_subset(union,itemsets)):
+                    yield union
+
+def count_range(candidates,transactions,min_sup,n_transactions,temp):
+    ''' Count one range of candidates in a pass over the transactions 
+    and add the frequent ones to temp
+    
+    param:
+    candidates: candidate itemsets as sorted tuples of the same length
+    transactions: list of (transaction, count) pairs
+    min_sup: minimum support value of a frequent itemset
+    n_transactions: number of transactions in the data base
+    temp: dictionary of the frequent itemsets found so far
+    '''
+    k = len(candidates[0])
+    # The trie leaves hold the candidate tuples of the range themselves
+    trie = build_candidate_trie(candidates,lambda itemset: itemset)
+    candidate_items = set()
+    for itemset in candidates:
+        candidate_items.update(itemset)
+    counts = defaultdict(int)
+    for transaction, count in transactions:
+        items = sorted(item for item in transaction 
+                       if item in candidate_items)
+        if len(items) >= k:
+            count_subsets(trie,items,0,k,counts,count)
+    for itemset, count in counts.iteritems():
+        if float(count)/n_transactions >= min_sup:
+            temp[frozenset(itemset)] = count
+
+def count_ranged(itemsets,transactions,min_sup,n_transactions,range_entries,
+                 buckets=None):
+    ''' Generate and count the candidate (k+1)-itemsets of the frequent
+    k-itemsets within a memory budget. Nothing is written to disk, the
+    budget is kept with extra passes instead: candidates are generated 
+    in lexicographic order and cut into ranges of at most range_entries,
+    and every range is counted through its own prefix trie in a 
+    separate pass over the transactions. Return the frequent 
+    (k+1)-itemsets and the number of candidates pruned by the DHP 
+    buckets
+    
+    param:
+    itemsets: frequent k-itemsets
+    transactions: list of (transaction, count) pairs
+    min_sup: minimum support value of a frequent itemset
+    n_transactions: number of transactions in the data base
+    range_entries: number of candidates counted in one pass
+    buckets: DHP bucket counts of the item pairs, used for k = 1
+    '''
+    temp = defaultdict(int)
+    pruned = 0
+    candidates = []
+    for union in prefix_candidates(itemsets):
+        if buckets is not None:
+            bucket = hash(union) % len(buckets)
+            if float(buckets[bucket])/n_transactions < min_sup:
+                pruned += 1
+                continue
+        candidates.append(union)
+        if len(candidates) == range_entries:
+            count_range(candidates,transactions,min_sup,n_transactions,temp)
+            candidates = []
+    if len(candidates) != 0:
+        count_range(candidates,transactions,min_sup,n_transactions,temp)
+    return temp, pruned
+
+def count_itemsets(itemsets,transactions):
+    ''' Count candidate itemsets of any length in a single pass over 
+    the transactions, with one candidate trie per length
+    
+    param:
+    itemsets: candidate itemsets
+    transactions: list of (transaction, count) pairs
+    '''
+    by_size = defaultdict(list)
+    for itemset in itemsets:
+        by_size[len(itemset)].append(itemset)
+    tries = [(k, build_candidate_trie(group)) 
+             for k, group in by_size.iteritems()]
+    temp = defaultdict(int)
+    for transaction, count in transactions:
+        items = sorted(transaction)
+        for k, trie in tries:
+            if len(items) >= k:
+                count_subsets(trie,items,0,k,temp,count)
+    return temp
+
+def to_bitset(tids,nbytes):
+    ''' Return a bitset with the bits of the given transaction ids set
+    '''
+    # Set the bits in a byte array first, converting it to a long at 
+    # once is much cheaper than or-ing one bit at a time
+    buf = bytearray(nbytes)
+    for tid in tids:
+        buf[nbytes - 1 - tid/8] |= 1 << (tid % 8)
+    return long(binascii.hexlify(buf),16)
+
+def item_bitsets(itemsets,transactions):
+    ''' Build the vertical layout of the transaction data base. 
+    Every frequent 1-itemset is mapped to a bitset in which bit t is 
+    set if transaction t contains the item. Return the bitsets and the 
+    weight planes of the transactions, a list of (value, bitset) where
+    bit t is set if the count of transaction t contains that value in
+    its binary representation
+    
+    param:
+    itemsets: frequent 1-itemsets
+    transactions: list of (transaction, count) pairs
+    '''
+    tidlists = defaultdict(list)
+    planes = defaultdict(list)
+    for tid, (transaction, count) in enumerate(transactions):
+        for item in transaction:
+            tidlists[item].append(tid)
+        value = 1
+        while value <= count:
+            if count & value:
+                planes[value].append(tid)
+            value <<= 1
+    nbytes = len(transactions)/8 + 1
+    bitsets = {}
+    for itemset in itemsets:
+        bitsets[itemset] = to_bitset(tidlists[iter(itemset).next()],nbytes)
+    weights = [(value, to_bitset(tids,nbytes)) 
+               for value, tids in sorted(planes.items())]
+    return bitsets, weights
+
+def bitset_support(bits,weights):
+    ''' Return the support count of a bitset of transaction ids
+    
+    param:
+    bits: bitset of transaction ids
+    weights: weight planes of the transactions from item_bitsets
+    '''
+    count = 0
+    for value, plane in weights:
+        count += value*bin(bits & plane).count('1')
+    return count
+
+def count_vertical(itemsets,bitsets,weights):
+    ''' Count the support of each candidate itemset by intersecting 
+    the bitsets of the two frequent k-itemsets it was joined from. 
+    Return the counts and the bitsets of the new candidates
+    
+    param:
+    itemsets: candidate (k+1)-itemsets
+    bitsets: bitsets of the frequent k-itemsets
+    weights: weight planes of the transactions from item_bitsets
+    '''
+    temp = defaultdict(int)
+    new_bitsets = {}
+    for itemset in itemsets:
+        items = sorted(itemset)
+        bits = bitsets[frozenset(items[:-1])] & \
+               bitsets[frozenset(items[:-2] + items[-1:])]
+        count = bitset_support(bits,weights)
+        if count != 0:
+            temp[frozenset(itemset)] = count
+            new_bitsets[frozenset(itemset)] = bits
+    return temp, new_bitsets
+
+def count_bitsets(itemsets,bitsets,weights):
+    ''' Count the support of each itemset by intersecting the bitsets 
+    of its items
+    
+    param:
+    itemsets: itemsets of any length
+    bitsets: bitsets of the 1-itemsets from item_bitsets
+    weights: weight planes of the transactions from item_bitsets
+    '''
+    temp = defaultdict(int)
+    for itemset in itemsets:
+        items = iter(itemset)
+        bits = bitsets[frozenset([items.next()])]
+        for item in items:
+            bits &= bitsets[frozenset([item])]
+        temp[itemset] = bitset_support(bits,weights)
+    return temp
+    
+# Number of set bits in every possible byte value
+POPCOUNT = np.array([bin(i).count('1') for i in range(256)],dtype=np.uint8)
+
+def transaction_matrix(itemsets,transactions):
+    ''' Build a packed boolean (items x transactions) matrix of the 
+    frequent 1-itemsets. Return the matrix and a dictionary mapping 
+    every item to its row
+    
+    param:
+    itemsets: frequent 1-itemsets
+    transactions: list of (transaction, count) pairs
+    '''
+    index = {}
+    for itemset in itemsets:
+        index[iter(itemset).next()] = len(index)
+    matrix = np.zeros((len(index),len(transactions)),dtype=bool)
+    for tid, (transaction, count) in enumerate(transactions):
+        for item in transaction:
+            if item in index:
+                matrix[index[item],tid] = True
+    return np.packbits(matrix,axis=1), index
+
+def weight_planes(transactions):
+    ''' Return the weight planes of the transactions for count_numpy, a
+    list of (value, packed row) where bit t of the row is set if the 
+    count of transaction t contains that value in its binary 
+    representation, or None if every transaction occurs once
+    
+    param:
+    transactions: list of (transaction, count) pairs
+    '''
+    counts = np.array([count for transaction, count in transactions],
+                      dtype=np.int64)
+    if np.all(counts == 1):
+        return None
+    planes = []
+    value = 1
+    while value <= counts.max():
+        plane = (counts & value) != 0
+        if plane.any():
+            planes.append((value, np.packbits(plane)))
+        value <<= 1
+    return planes
+
+def count_numpy(itemsets,matrix,index,weights=None,batch_bytes=2**25):
+    ''' Count the support of a whole batch of candidate itemsets at 
+    once by and-ing the packed rows of their items and summing the
+    set bits, or the weights of the set bits
+    
+    param:
+    itemsets: candidate itemsets
+    matrix: packed transaction matrix from transaction_matrix
+    index: dictionary mapping every item to its row in the matrix
+    weights: weight planes of the transactions from weight_planes, None
+    if every transaction occurs once
+    batch_bytes: memory used for the intermediate rows of one batch
+    '''
+    temp = defaultdict(int)
+    if len(itemsets) == 0:
+        return temp
+    keys = [frozenset(itemset) for itemset in itemsets]
+    rows = np.array([[index[item] for item in itemset] 
+                     for itemset in itemsets],dtype=np.intp)
+    batch = max(1,batch_bytes/matrix.shape[1])
+    for start in range(0,len(keys),batch):
+        idx = rows[start:start+batch]
+        bits = matrix[idx[:,0]]
+        for j in range(1,idx.shape[1]):
+            bits &= matrix[idx[:,j]]
+        if weights is None:
+            counts = POPCOUNT[bits].sum(axis=1,dtype=np.int64)
+        else:
+            # Popcount the rows on every weight plane instead of 
+            # unpacking them, which would take eight times the memory
+            counts = np.zeros(len(idx),dtype=np.int64)
+            for value, plane in weights:
+                counts += value*POPCOUNT[bits & plane].sum(axis=1,
+                                                          dtype=np.int64)
+        for i in np.flatnonzero(counts):
+            temp[keys[start+i]] = int(counts[i])
+    return temp
+    
+def init_count_worker(itemsets,shards):
+    ''' Store the candidates of the current level and the transaction
+    shards in a worker process. Called once per worker when the pool
+    starts, so the candidates are not sent along with every task
+    '''
+    global worker_itemsets, worker_shards
+    worker_itemsets = itemsets
+    worker_shards = shards
+
+def count_shard(i):
+    ''' Count the candidates in the i-th transaction shard. Return the 
+    counts in the order of the candidates
+    '''
+    temp = count_trie(worker_itemsets,worker_shards[i])
+    return [temp.get(frozenset(itemset),0) for itemset in worker_itemsets]
+
+def count_parallel(itemsets,shards,processes):
+    ''' Count Distribution: every worker process counts the candidates
+    in one shard of the transactions and the local counts are summed
+    
+    param:
+    itemsets: candidate itemsets
+    shards: list of transaction shards
+    processes: number of worker processes
+    '''
+    temp = defaultdict(int)
+    if len(itemsets) == 0:
+        return temp
+    totals = [0]*len(itemsets)
+    pool = multiprocessing.Pool(processes,init_count_worker,
+                                (itemsets,shards))
+    try:
+        for counts in pool.imap_unordered(count_shard,range(len(shards))):
+            for i, count in enumerate(counts):
+                totals[i] += count
+    finally:
+        pool.close()
+        pool.join()
+    for itemset, count in zip(itemsets,totals):
+        if count != 0:
+            temp[frozenset(itemset)] = count
+    return temp
+    
+def generate_itemsets(itemsets_list, min_sup, transactions, 
+                      counting='horizontal', processes=None, buckets=None,
+                      range_entries=1000000):
     ''' Generate all frequent itemsets with length more than 1
-    in the apriori algoritm 
+    in the apriori algoritm. Return the number of candidate 2-itemsets
+    pruned by the DHP buckets
     
     param:
     itemsets_list: a list of 1-itemsets, 2-itemsets, ... , k-itemsets
     min_sup: minimum support value of a frequent itemset
-    transactions: transaction data base
+    transactions: list of (transaction, count) pairs
+    counting: support counting method, 'horizontal' scans the 
+    transactions for every candidate, 'trie' walks every transaction 
+    once through a prefix trie of the candidates, 'vertical' 
+    intersects the bitsets of the frequent itemsets, 'numpy' counts 
+    all candidates of a level with vectorized operations on a packed 
+    transaction matrix, 'parallel' splits the transactions into shards
+    that are counted in a process pool, 'ranged' generates and counts 
+    the candidates in ranges of range_entries, one pass per range
+    processes: number of worker processes for 'parallel' counting, 
+    defaults to the number of CPUs
+    buckets: DHP bucket counts of the item pairs filled by hash_pairs 
+    during the 1-itemset scan, None to count every candidate 2-itemset
+    range_entries: number of candidates counted in one pass by 
+    'ranged' counting
     '''
+    if counting not in ('horizontal','trie','vertical','numpy','parallel',
+                        'ranged'):
+        raise ValueError("Unknown counting method: %s"%counting)
+    n_transactions = sum(count for transaction, count in transactions)
     L = itemsets_list[0]
     k = len(itemsets_list)
+    pruned = 0
+    if counting == 'vertical':
+        bitsets, weights = item_bitsets(L,transactions)
+    elif counting == 'numpy':
+        matrix, index = transaction_matrix(L,transactions)
+        weights = weight_planes(transactions)
+    elif counting == 'parallel':
+        if processes is None:
+            processes = multiprocessing.cpu_count()
+        shards = [transactions[i::processes] for i in range(processes)]
     while(len(L) != 0): 
+        if counting == 'ranged':
+            # Candidates are generated and counted range by range
+            temp, dropped = count_ranged(L,transactions,min_sup,
+                                         n_transactions,range_entries,
+                                         buckets if k == 1 else None)
+            if k == 1:
+                pruned = dropped
+            itemsets_list.append(temp)
+            k += 1
+            L = itemsets_list[k-1]
+            continue
+        
         try:
             next_itemsets = apriori_gen(L)
         except IndexError:
-            return
+            return pruned
         
-        temp = defaultdict(int)
-        for itemset in next_itemsets:
-            for transaction in transactions:
-                if itemset.issubset(transaction):
-                    temp[frozenset(itemset)] += 1
+        if buckets is not None and k == 1:
+            next_itemsets, pruned = dhp_prune(next_itemsets,buckets,
+                                              min_sup,n_transactions)
+        
+        if counting == 'vertical':
+            temp, bitsets = count_vertical(next_itemsets,bitsets,weights)
+        elif counting == 'trie':
+            temp = count_trie(next_itemsets,transactions)
+        elif counting == 'numpy':
+            temp = count_numpy(next_itemsets,matrix,index,weights)
+        elif counting == 'parallel':
+            temp = count_parallel(next_itemsets,shards,processes)
+        else:
+            temp = count_horizontal(next_itemsets,transactions)
                 
-        prune_itemsets(temp,min_sup,transactions)
+        prune_itemsets(temp,min_sup,n_transactions)
+        if counting == 'vertical':
+            for itemset in bitsets.keys():
+                if itemset not in temp:
+                    del bitsets[itemset]
         
         itemsets_list.append(temp)
         k += 1
         L = itemsets_list[k-1]
+    return pruned
         
-def calc_conf(x,transactions,support):
-    '''Calculate support of an itemset x in the transaction
+def frequent_itemsets(transactions,min_sup,counting='horizontal'):
+    ''' Run the whole apriori algorithm on a transaction data base.
+    Return the list of frequent 1-itemsets, 2-itemsets, ... , k-itemsets
+    
+    param:
+    transactions: list of (transaction, count) pairs
+    min_sup: minimum support value of a frequent itemset
+    counting: support counting method of generate_itemsets
+    '''
+    n_transactions = sum(count for transaction, count in transactions)
+    itemsets_list = [defaultdict(int)]
+    for transaction, count in transactions:
+        for item in transaction:
+            itemsets_list[0][frozenset([item])] += count
+    prune_itemsets(itemsets_list[0],min_sup,n_transactions)
+    generate_itemsets(itemsets_list,min_sup,transactions,counting)
+    return itemsets_list
+
+def split_itemsets(itemsets):
+    ''' Split a dictionary of itemsets of any length into the list of 
+    1-itemsets, 2-itemsets, ... , k-itemsets used by generate_itemsets
+    
+    param:
+    itemsets: dictionary mapping itemsets to their support counts
+    '''
+    itemsets_list = [defaultdict(int)]
+    for itemset, count in itemsets.iteritems():
+        while len(itemsets_list) <= len(itemset):
+            itemsets_list.append(defaultdict(int))
+        itemsets_list[len(itemset)-1][itemset] = count
+    return itemsets_list
+
+def is_subsumed(itemset,itemsets):
+    ''' Check if an itemset is a subset of one of the given itemsets
     '''
+    for other in itemsets:
+        if itemset <= other:
+            return True
+    return False
+
+def charm(itemsets,transactions,min_sup):
+    ''' CHARM: mine the closed frequent itemsets, the frequent itemsets
+    that have no superset with the same support. The search runs over
+    itemset-bitset pairs and skips branches that cannot produce a closed
+    itemset instead of filtering all frequent itemsets afterwards. 
+    Return a dictionary mapping every closed itemset to its support
+    
+    param:
+    itemsets: frequent 1-itemsets
+    transactions: list of (transaction, count) pairs
+    min_sup: minimum support value of a frequent itemset
+    '''
+    n_transactions = sum(count for transaction, count in transactions)
+    bitsets, weights = item_bitsets(itemsets,transactions)
+    nodes = [[itemset, bits, bitset_support(bits,weights)] 
+             for itemset, bits in bitsets.iteritems()]
+    closed = {}
+    charm_extend(nodes,closed,weights,min_sup*n_transactions)
+    return dict(closed.itervalues())
+
+def charm_extend(nodes,closed,weights,min_count):
+    ''' Extend every node with the nodes after it. Two nodes with the 
+    same bitset are merged, a node whose bitset is contained in the 
+    other's absorbs the other's items, and other pairs become children.
+    Closed itemsets are stored by bitset, itemsets with the same bitset 
+    share the same closure
+    
+    param:
+    nodes: list of [itemset, bitset, support]
+    closed: dictionary mapping bitsets to (closed itemset, support)
+    weights: weight planes of the transactions from item_bitsets
+    min_count: minimum support count of a frequent itemset
+    '''
+    nodes.sort(key=lambda node: node[2])
     i = 0
-    for transaction in transactions:
-        if x.issubset(set(transaction)):
-            i += 1;
-    return support/(float(i)/len(transactions))
+    while i < len(nodes):
+        itemset, bits, support = nodes[i]
+        children = []
+        j = i + 1
+        while j < len(nodes):
+            other, other_bits, other_support = nodes[j]
+            common = bits & other_bits
+            if common == bits:
+                # Every transaction with itemset also contains other
+                itemset = itemset | other
+                for child in children:
+                    child[0] = child[0] | other
+                if common == other_bits:
+                    del nodes[j]
+                    continue
+            elif common == other_bits:
+                # other only occurs together with itemset
+                children.append([itemset | other, common, other_support])
+                del nodes[j]
+                continue
+            else:
+                common_support = bitset_support(common,weights)
+                if common_support >= min_count:
+                    children.append([itemset | other, common, common_support])
+            j += 1
+        if len(children) != 0:
+            charm_extend(children,closed,weights,min_count)
+        if bits in closed:
+            itemset = itemset | closed[bits][0]
+        closed[bits] = (itemset, support)
+        i += 1
+
+def max_itemsets(itemsets,transactions,min_sup):
+    ''' Mine the maximal frequent itemsets, the frequent itemsets that 
+    have no frequent superset. A depth first search over bitsets, a 
+    branch is skipped when its head together with all of its possible
+    extensions is already contained in a maximal itemset. Return a 
+    dictionary mapping every maximal itemset to its support
+    
+    param:
+    itemsets: frequent 1-itemsets
+    transactions: list of (transaction, count) pairs
+    min_sup: minimum support value of a frequent itemset
+    '''
+    n_transactions = sum(count for transaction, count in transactions)
+    bitsets, weights = item_bitsets(itemsets,transactions)
+    tail = [(iter(itemset).next(), bits, bitset_support(bits,weights)) 
+            for itemset, bits in bitsets.iteritems()]
+    tail.sort(key=lambda node: node[2])
+    maximal = {}
+    max_extend(frozenset(),tail,maximal,weights,min_sup*n_transactions)
+    return maximal
+
+def max_extend(head,tail,maximal,weights,min_count):
+    ''' Extend head with every item of tail in turn
+    
+    param:
+    head: current itemset
+    tail: list of (item, bitset of head with the item, support) of the
+    items that can still be added to head
+    maximal: dictionary of the maximal itemsets found so far
+    weights: weight planes of the transactions from item_bitsets
+    min_count: minimum support count of a frequent itemset
+    '''
+    if is_subsumed(head.union(item for item, bits, s in tail),maximal):
+        return
+    for i, (item, bits, support) in enumerate(tail):
+        new_head = head | frozenset([item])
+        new_tail = []
+        for other, other_bits, other_support in tail[i+1:]:
+            common = bits & other_bits
+            if common == bits:
+                common_support = support
+            else:
+                common_support = bitset_support(common,weights)
+            if common_support >= min_count:
+                new_tail.append((other, common, common_support))
+        if len(new_tail) != 0:
+            new_tail.sort(key=lambda node: node[2])
+            max_extend(new_head,new_tail,maximal,weights,min_count)
+        elif not is_subsumed(new_head,maximal):
+            for other in maximal.keys():
+                if other <= new_head:
+                    del maximal[other]
+            maximal[new_head] = support
 
-def generate_rules(itemset,min_conf,support,transactions):
-    '''Generates rules from a frequent itemset. 
+def parse_transaction(line,keys):
+    ''' Turn one record of the adult data set into a transaction of 
+    attribute=value items, discretized like the in-memory pipeline. 
+    Return None for blank lines and records with capital gain 99999
+    
+    param:
+    line: a comma separated record
+    keys: attribute names of the kept columns
+    '''
+    row = [item.strip() for item in line.split(',')]
+    if len(row) < 15 or int(row[10]) == 99999:
+        return None
+    temp = row[:]
+    temp[0] = age_bins(row[0])
+    temp[10] = capgain_bins(row[10])
+    temp[11] = caploss_bins(row[11])
+    temp[12] = workhour_bins(row[12])
+    del temp[4]
+    del temp[2]
+    return ['%s=%s'%(keys[i],item) for i, item in enumerate(temp)]
+
+def read_transactions(path,keys):
+    ''' Stream the adult data set from a file or URL and yield its 
+    transactions one at a time
+    
+    param:
+    path: file name or http(s) URL of the data set
+    keys: attribute names of the kept columns
+    '''
+    if path.startswith('http'):
+        f = urllib2.urlopen(path)
+    else:
+        f = open(path)
+    try:
+        for line in f:
+            transaction = parse_transaction(line,keys)
+            if transaction is not None:
+                yield transaction
+    finally:
+        f.close()
+
+def read_chunks(path,chunk_size,keys):
+    ''' Stream the adult data set from a file or URL and yield lists of
+    at most chunk_size transactions
+    
+    param:
+    path: file name or http(s) URL of the data set
+    chunk_size: number of transactions per chunk
+    keys: attribute names of the kept columns
+    '''
+    chunk = []
+    for transaction in read_transactions(path,keys):
+        chunk.append(transaction)
+        if len(chunk) == chunk_size:
+            yield chunk
+            chunk = []
+    if len(chunk) != 0:
+        yield chunk
+
+def son_mining(path,min_sup,chunk_size,keys,counting='horizontal'):
+    ''' Partition (SON) algorithm. Phase one mines every chunk of the 
+    data set on its own at min_sup, any globally frequent itemset is 
+    frequent in at least one chunk. Phase two streams the data set again 
+    and counts the collected candidates exactly. Only one chunk is held
+    in memory at a time. Return the list of frequent 1-itemsets, 
+    2-itemsets, ..., the number of transactions and the item names
+    
+    param:
+    path: file name or http(s) URL of the data set
+    min_sup: minimum support value of a frequent itemset
+    chunk_size: number of transactions per chunk
+    keys: attribute names of the kept columns
+    counting: support counting method used in phase one
+    '''
+    item_ids = {}
+    item_names = []
+    # Phase one: local frequent itemsets of every chunk
+    candidates = defaultdict(set)
+    for chunk in read_chunks(path,chunk_size,keys):
+        chunk = encode_transactions(chunk,item_ids,item_names)[0]
+        chunk = dedup_transactions(chunk)
+        for itemsets in frequent_itemsets(chunk,min_sup,counting):
+            for itemset in itemsets:
+                candidates[len(itemset)].add(itemset)
+    # Phase two: global support of the candidates, through one candidate
+    # trie per length that is built once and reused for every chunk
+    tries = []
+    for k, itemsets in candidates.iteritems():
+        candidate_items = set()
+        for itemset in itemsets:
+            candidate_items.update(itemset)
+        tries.append((k, build_candidate_trie(itemsets), candidate_items))
+    n_transactions = 0
+    counts = defaultdict(int)
+    for chunk in read_chunks(path,chunk_size,keys):
+        n_transactions += len(chunk)
+        chunk = encode_transactions(chunk,item_ids,item_names)[0]
+        chunk = dedup_transactions(chunk)
+        for k, trie, candidate_items in tries:
+            for transaction, count in chunk:
+                items = sorted(item for item in transaction 
+                               if item in candidate_items)
+                if len(items) >= k:
+                    count_subsets(trie,items,0,k,counts,count)
+    prune_itemsets(counts,min_sup,n_transactions)
+    return split_itemsets(counts), n_transactions, item_names
+
+def negative_border(itemsets_list,items):
+    ''' Return the negative border of a collection of frequent 
+    itemsets: the itemsets that are not frequent but whose subsets all 
+    are
+    
+    param:
+    itemsets_list: a list of frequent 1-itemsets, 2-itemsets, ...
+    items: all items of the transaction data base
+    '''
+    border = [frozenset([item]) for item in items 
+              if frozenset([item]) not in itemsets_list[0]]
+    for k, itemsets in enumerate(itemsets_list[:-1]):
+        if len(itemsets) == 0:
+            break
+        for itemset in apriori_gen(itemsets):
+            if itemset not in itemsets_list[k+1]:
+                border.append(itemset)
+    return border
+
+def sample_mining(transactions,min_sup,sample_size,lowered_sup=None,
+                  counting='horizontal'):
+    ''' Sampling algorithm (Toivonen). Mine a random sample at a lowered
+    minimum support, then count the result and its negative border in 
+    one pass over the whole data base. If no itemset of the negative 
+    border is frequent the result is exact, otherwise candidates are 
+    generated from the new frequent itemsets and counted in further 
+    passes until none are left. Return the list of frequent 1-itemsets,
+    2-itemsets, ... and the number of passes over the data base
+    
+    param:
+    transactions: list of (transaction, count) pairs
+    min_sup: minimum support value of a frequent itemset
+    sample_size: number of transactions in the sample
+    lowered_sup: minimum support used on the sample, defaults to 
+    0.8*min_sup to make a second pass unlikely
+    counting: support counting method used on the sample
+    '''
+    if lowered_sup is None:
+        lowered_sup = 0.8*min_sup
+    n_transactions = 0
+    population = []
+    items = set()
+    for tid, (transaction, count) in enumerate(transactions):
+        n_transactions += count
+        population.extend([tid]*count)
+        items.update(transaction)
+    sample = defaultdict(int)
+    for tid in random.sample(population,min(sample_size,len(population))):
+        sample[tid] += 1
+    del population
+    sample = [(transactions[tid][0], count) 
+              for tid, count in sample.iteritems()]
+    
+    # Mine the sample and count the result and its negative border
+    sample_list = frequent_itemsets(sample,lowered_sup,counting)
+    candidates = negative_border(sample_list,items)
+    for itemsets in sample_list:
+        candidates.extend(itemsets)
+    counts = count_itemsets(candidates,transactions)
+    counted = set(candidates)
+    passes = 1
+    
+    # Frequent itemsets of the negative border may have frequent 
+    # supersets that were never counted
+    while True:
+        prune_itemsets(counts,min_sup,n_transactions)
+        itemsets_list = split_itemsets(counts)
+        new_candidates = []
+        for itemsets in itemsets_list:
+            if len(itemsets) == 0:
+                continue
+            for itemset in apriori_gen(itemsets):
+                if itemset not in counted:
+                    new_candidates.append(itemset)
+        if len(new_candidates) == 0:
+            return itemsets_list, passes
+        counts.update(count_itemsets(new_candidates,transactions))
+        counted.update(new_candidates)
+        passes += 1
+
+def fup_update(itemsets_list,transactions,increment,min_sup):
+    ''' Incremental update (FUP) of the frequent itemsets of a data base
+    after new transactions are appended to it. Candidates of every level
+    are generated from the updated frequent itemsets of the level below.
+    Candidates that were frequent before only need their count in the 
+    increment added. Any other candidate was infrequent in the old data 
+    base, so it can only become frequent if it is frequent within the 
+    increment, and only those candidates are counted in the old data 
+    base. Return the updated list of frequent 1-itemsets, 2-itemsets, ...
+    
+    param:
+    itemsets_list: frequent itemsets with their support counts of the
+    old data base, as returned by generate_itemsets
+    transactions: list of (transaction, count) pairs of the old data base
+    increment: list of (transaction, count) pairs of the new transactions
+    min_sup: minimum support value of a frequent itemset
+    '''
+    n_old = sum(count for transaction, count in transactions)
+    n_new = sum(count for transaction, count in increment)
+    n_transactions = n_old + n_new
+    items = set()
+    for transaction, count in increment:
+        items.update(transaction)
+    candidates = [frozenset([item]) for item in items]
+    for itemset in itemsets_list[0]:
+        if iter(itemset).next() not in items:
+            candidates.append(itemset)
+    # Both data bases are counted on the bitsets of their items, the
+    # old one only once some candidate needs it
+    singletons = list(candidates)
+    inc_bitsets, inc_weights = item_bitsets(singletons,increment)
+    old_bitsets = None
+    
+    updated_list = []
+    k = 0
+    while len(candidates) != 0:
+        if k < len(itemsets_list):
+            old = itemsets_list[k]
+        else:
+            old = {}
+        temp = count_bitsets(candidates,inc_bitsets,inc_weights)
+        rescan = []
+        for itemset in candidates:
+            if itemset in old:
+                temp[itemset] += old[itemset]
+            elif temp[itemset] < min_sup*n_new:
+                del temp[itemset]
+            else:
+                rescan.append(itemset)
+        if len(rescan) != 0:
+            if old_bitsets is None:
+                old_bitsets, old_weights = item_bitsets(singletons,
+                                                        transactions)
+            counts = count_bitsets(rescan,old_bitsets,old_weights)
+            for itemset, count in counts.iteritems():
+                temp[itemset] += count
+        prune_itemsets(temp,min_sup,n_transactions)
+        updated_list.append(temp)
+        try:
+            candidates = apriori_gen(temp)
+        except IndexError:
+            candidates = []
+        k += 1
+    if len(updated_list) == 0 or len(updated_list[-1]) != 0:
+        updated_list.append(defaultdict(int))
+    return updated_list
+
+class LossyCounter(object):
+    ''' Lossy Counting (Manku, Motwani) of frequent itemsets over a 
+    stream of transactions of any items. The stream is divided into 
+    buckets of ceil(1/epsilon) transactions, and batch_buckets buckets 
+    are buffered and counted at once. Every kept itemset has a count 
+    and the maximum number of occurrences it may have missed before it
+    was kept. Itemsets whose count plus error do not exceed the number 
+    of buckets seen are dropped, so memory is bounded by epsilon rather
+    than the length of the stream. Counts are underestimated by at most
+    the number of closed buckets, about epsilon*N for N transactions
+    
+    param:
+    epsilon: maximum error of the support
+    batch_buckets: number of buckets counted in one batch
+    max_len: maximum length of the counted itemsets, None for no limit
+    '''
+    def __init__(self,epsilon,batch_buckets=50,max_len=None):
+        self.epsilon = epsilon
+        self.width = int(math.ceil(1.0/epsilon))
+        self.batch_size = self.width*batch_buckets
+        self.max_len = max_len
+        self.n_transactions = 0
+        self.bucket = 0   # number of closed buckets
+        self.entries = {} # itemset -> [count, maximum error]
+        self.buffer = []
+        
+    def add(self,transaction):
+        ''' Add one transaction to the stream '''
+        self.buffer.append(transaction)
+        self.n_transactions += 1
+        if len(self.buffer) == self.batch_size:
+            self.flush()
+            
+    def count_batch(self,batch,min_count):
+        ''' Count the kept itemsets and the itemsets that occur at least 
+        min_count times in a batch of transactions. Return a dictionary 
+        of the batch count of every counted itemset
+        
+        param:
+        batch: list of transactions
+        min_count: minimum batch count of an itemset that is not kept
+        '''
+        by_size = defaultdict(list)
+        for itemset in self.entries:
+            by_size[len(itemset)].append(itemset)
+        if len(batch) == 0:
+            return dict.fromkeys(self.entries,0)
+        # Duplicates are not collapsed, a single weight plane keeps the
+        # bitset counting cheap
+        batch = [(transaction, 1) for transaction in batch]
+        items = set()
+        for transaction, count in batch:
+            items.update(transaction)
+        singletons = [frozenset([item]) for item in items]
+        bitsets, weights = item_bitsets(singletons,batch)
+        # An itemset that is not kept yet needs at least min_count 
+        # occurrences in the batch, which all of its subsets have too,
+        # so new candidates are generated level by level
+        batch_counts = {}
+        candidates = set(singletons)
+        max_size = max(by_size.keys() + [0])
+        k = 1
+        while len(candidates) != 0 or k <= max_size:
+            candidates.update(by_size[k])
+            # Itemsets with an item outside the batch do not occur in it
+            counts = count_bitsets([itemset for itemset in candidates
+                                    if itemset <= items],bitsets,weights)
+            frequent = {}
+            for itemset in candidates:
+                count = counts[itemset]
+                batch_counts[itemset] = count
+                if count >= min_count:
+                    frequent[itemset] = count
+            k += 1
+            if len(frequent) == 0 or (self.max_len is not None and 
+                                      k > self.max_len):
+                candidates = set()
+            else:
+                candidates = set(apriori_gen(frequent))
+        return batch_counts
+            
+    def flush(self):
+        ''' Count the full buckets of the buffered transactions. The 
+        transactions of a partially filled bucket stay in the buffer
+        '''
+        beta = len(self.buffer)//self.width
+        if beta == 0:
+            return
+        batch = self.buffer[:beta*self.width]
+        self.buffer = self.buffer[beta*self.width:]
+        error = self.bucket
+        self.bucket += beta
+        for itemset, count in self.count_batch(batch,beta).iteritems():
+            if itemset in self.entries:
+                self.entries[itemset][0] += count
+            elif count >= beta:
+                self.entries[itemset] = [count, error]
+        for itemset, (count, delta) in self.entries.items():
+            if count + delta <= self.bucket:
+                del self.entries[itemset]
+            
+    def frequent_itemsets(self,min_sup):
+        ''' Return the list of 1-itemsets, 2-itemsets, ... whose count 
+        is at least (min_sup - epsilon)*N. Every itemset with a support 
+        of at least min_sup is included. The buffered transactions are 
+        counted without closing a bucket, so querying does not change
+        the state of the counter
+        
+        param:
+        min_sup: minimum support value of a frequent itemset
+        '''
+        min_count = (min_sup - self.epsilon)*self.n_transactions
+        # An itemset that is not kept occurred at most once per closed
+        # bucket, so it needs min_count occurrences in the buffer
+        counts = {}
+        batch_counts = self.count_batch(self.buffer,max(min_count,1))
+        for itemset, count in batch_counts.iteritems():
+            if itemset in self.entries:
+                count += self.entries[itemset][0]
+            if count >= min_count and count > 0:
+                counts[itemset] = count
+        return split_itemsets(counts)
+
+def cache_key(transactions,item_names):
+    ''' Return a content hash of a transaction data base that does not 
+    depend on the order of the transactions or on the item ids
+    
+    param:
+    transactions: list of (transaction, count) pairs
+    item_names: names of the item ids
+    '''
+    rows = sorted('%d:%s'%(count,','.join(sorted(item_names[item] 
+                                                  for item in transaction)))
+                  for transaction, count in transactions)
+    return hashlib.sha1('\n'.join(rows)).hexdigest()
+
+def save_cache(cache_dir,key,min_sup,itemsets_list,item_names,max_bytes):
+    ''' Store frequent itemsets and their support counts in the result 
+    cache under the key of their data base. The file holds the minimum 
+    support, a table of the item names and every itemset as its length,
+    item indices and count, packed with struct and compressed with zlib.
+    The least recently used files are evicted while the cache is larger
+    than max_bytes
+    
+    param:
+    cache_dir: directory of the cache files
+    key: content hash of the data base from cache_key
+    min_sup: minimum support the itemsets were mined at
+    itemsets_list: a list of frequent 1-itemsets, 2-itemsets, ...
+    item_names: names of the item ids
+    max_bytes: maximum size of all cache files together
+    '''
+    index = {}
+    names = []
+    records = []
+    for itemsets in itemsets_list:
+        for itemset, count in itemsets.iteritems():
+            ids = []
+            for item in sorted(itemset):
+                if item not in index:
+                    index[item] = len(names)
+                    names.append(item_names[item])
+                ids.append(index[item])
+            records.append(struct.pack('<B%dHI'%len(ids),len(ids),
+                                       *(ids + [count])))
+    data = [struct.pack('<dI',min_sup,len(names))]
+    for name in names:
+        data.append(struct.pack('<H',len(name)) + name)
+    data.append(struct.pack('<I',len(records)))
+    data.extend(records)
+    if not os.path.isdir(cache_dir):
+        os.makedirs(cache_dir)
+    path = os.path.join(cache_dir,key + '.cache')
+    f = open(path + '.tmp','wb')
+    try:
+        f.write(zlib.compress(''.join(data)))
+    finally:
+        f.close()
+    os.rename(path + '.tmp',path)
+    evict_cache(cache_dir,max_bytes)
+
+def load_cache(cache_dir,key,item_names):
+    ''' Return the minimum support and the dictionary of itemsets with 
+    their support counts stored for a data base, or None if it is not 
+    in the cache
+    
+    param:
+    cache_dir: directory of the cache files
+    key: content hash of the data base from cache_key
+    item_names: names of the item ids of the current run
+    '''
+    path = os.path.join(cache_dir,key + '.cache')
+    if not os.path.exists(path):
+        return None
+    f = open(path,'rb')
+    try:
+        data = zlib.decompress(f.read())
+    finally:
+        f.close()
+    # Mark the file as recently used
+    os.utime(path,None)
+    item_ids = dict((name, item) for item, name in enumerate(item_names))
+    min_sup, n_names = struct.unpack_from('<dI',data)
+    pos = struct.calcsize('<dI')
+    ids = []
+    for i in range(n_names):
+        length, = struct.unpack_from('<H',data,pos)
+        pos += 2
+        ids.append(item_ids[data[pos:pos+length]])
+        pos += length
+    n_itemsets, = struct.unpack_from('<I',data,pos)
+    pos += 4
+    itemsets = {}
+    for i in range(n_itemsets):
+        k, = struct.unpack_from('<B',data,pos)
+        fmt = '<B%dHI'%k
+        record = struct.unpack_from(fmt,data,pos)
+        pos += struct.calcsize(fmt)
+        itemsets[frozenset(ids[j] for j in record[1:-1])] = record[-1]
+    return min_sup, itemsets
+
+def evict_cache(cache_dir,max_bytes):
+    ''' Delete the least recently used cache files until the cache 
+    holds at most max_bytes, the newest file is always kept
+    '''
+    files = []
+    for path in glob.glob(os.path.join(cache_dir,'*.cache')):
+        files.append((os.path.getmtime(path),os.path.getsize(path),path))
+    files.sort()
+    total = sum(size for mtime, size, path in files)
+    while total > max_bytes and len(files) > 1:
+        mtime, size, path = files.pop(0)
+        os.remove(path)
+        total -= size
+
+def extend_itemsets(itemsets_list,known,transactions,min_sup):
+    ''' Generate all frequent itemsets with length more than 1 like 
+    generate_itemsets, taking the support counts of the candidates in 
+    known from there. Only the other candidates are counted, on the 
+    bitsets of their items
+    
+    param:
+    itemsets_list: a list with the frequent 1-itemsets
+    known: dictionary of itemsets with known support counts
+    transactions: list of (transaction, count) pairs
+    min_sup: minimum support value of a frequent itemset
+    '''
+    n_transactions = sum(count for transaction, count in transactions)
+    bitsets = None
+    L = itemsets_list[-1]
+    while len(L) != 0:
+        temp = defaultdict(int)
+        missing = []
+        for itemset in apriori_gen(L):
+            if itemset in known:
+                temp[itemset] = known[itemset]
+            else:
+                missing.append(itemset)
+        if len(missing) != 0:
+            if bitsets is None:
+                bitsets, weights = item_bitsets(itemsets_list[0],
+                                                transactions)
+            temp.update(count_bitsets(missing,bitsets,weights))
+        prune_itemsets(temp,min_sup,n_transactions)
+        itemsets_list.append(temp)
+        L = temp
+
+def support_table(itemsets_list):
+    '''Merge the frequent itemsets of every size into one dictionary
+    that maps each itemset to its support count
+    '''
+    table = {}
+    for itemsets in itemsets_list:
+        table.update(itemsets)
+    return table
+
+def closed_support(itemset,table):
+    '''Return the support count of an itemset. If the table only holds
+    closed itemsets, the support is that of the smallest closed superset
+    '''
+    try:
+        return table[itemset]
+    except KeyError:
+        return max(f for other, f in table.iteritems() if itemset <= other)
+
+def fill_supports(table):
+    '''Add every subset of the closed itemsets in the table with its 
+    support, so rules from closed itemsets look their antecedents up 
+    directly instead of searching for a closed superset. Closed itemsets
+    are expanded in descending order of support, and every subset is
+    expanded once, so the first closed superset that reaches a subset 
+    has the largest support
+    
+    param:
+    table: support counts of the closed itemsets
+    '''
+    done = set()
+    for itemset, f in sorted(table.items(),key=lambda x: -x[1]):
+        stack = [(itemset, f)]
+        while len(stack) != 0:
+            subset, f = stack.pop()
+            if subset in done:
+                continue
+            done.add(subset)
+            f = table.setdefault(subset,f)
+            if len(subset) > 1:
+                for item in subset:
+                    stack.append((subset - frozenset([item]), f))
+
+def calc_conf(x,itemset,table):
+    '''Calculate the confidence of the rule x ==> itemset - x using the
+    support counts in the support table
+    '''
+    return float(table[itemset])/closed_support(frozenset(x),table)
+
+def generate_rules(itemset,min_conf,table):
+    '''Generates rules from a frequent itemset. Consequents are grown
+    one item at a time with apriori_gen. Moving an item from the 
+    antecedent to the consequent cannot raise the confidence, so a 
+    consequent that fails min_conf is never extended.
     
     param:
-    support = support value of the itemset. 
     itemset = a frequent itemset 
     min_conf = minimum confidence
-    transactions = transaction data set
+    table = support counts of all frequent itemsets
     '''
     rules = defaultdict(set)
-    k = {}
-    n = len(itemset)
-    while n > 0:
-        for combination in combinations(itemset,n-1):
-            if (len(combination)!=0):
-                if calc_conf(set(combination),transactions,support) >= min_conf:
-                    k = itemset - set(combination)
-                    rules[frozenset(combination)] = (frozenset(k))
-        n += -1;       
+    consequents = [frozenset([item]) for item in itemset]
+    while len(consequents) != 0 and len(consequents[0]) < len(itemset):
+        passed = []
+        for consequent in consequents:
+            antecedent = itemset - consequent
+            if calc_conf(antecedent,itemset,table) >= min_conf:
+                rules[antecedent] = consequent
+                passed.append(consequent)
+        if len(passed) == 0:
+            break
+        consequents = apriori_gen(passed)
     return rules
+
+def candidate_rules(table):
+    ''' Generate every rule antecedent ==> consequent that splits a 
+    frequent itemset of the support table in two, as (antecedent, 
+    consequent) pairs
+    '''
+    for itemset in table:
+        items = sorted(itemset)
+        for k in range(1,len(items)):
+            for antecedent in combinations(items,k):
+                antecedent = frozenset(antecedent)
+                yield antecedent, itemset - antecedent
+
+def rule_metrics(rules,table,n_transactions):
+    ''' Compute the interestingness measures of many rules at once on 
+    NumPy arrays of the supports of their antecedents, consequents and 
+    itemsets. Return a dictionary mapping 'support', 'confidence', 
+    'lift', 'leverage', 'conviction' and 'chi2' to an array with one 
+    value per rule. Conviction is infinite for rules with a confidence 
+    of 1
+    
+    param:
+    rules: list of (antecedent, consequent) pairs
+    table: support counts of all frequent itemsets
+    n_transactions: number of transactions in the data base
+    '''
+    n = float(n_transactions)
+    joint = np.empty(len(rules))
+    ante = np.empty(len(rules))
+    cons = np.empty(len(rules))
+    for i, (antecedent, consequent) in enumerate(rules):
+        joint[i] = closed_support(antecedent | consequent,table)
+        ante[i] = closed_support(antecedent,table)
+        cons[i] = closed_support(consequent,table)
+    joint /= n
+    ante /= n
+    cons /= n
+    with np.errstate(divide='ignore',invalid='ignore'):
+        confidence = joint/ante
+        leverage = joint - ante*cons
+        conviction = (1 - cons)/(1 - confidence)
+        conviction[confidence >= 1] = np.inf
+        # Chi-square of the 2x2 contingency table of antecedent and 
+        # consequent, 0 if either occurs in every transaction
+        chi2 = n*leverage**2/(ante*(1 - ante)*cons*(1 - cons))
+        chi2[~np.isfinite(chi2)] = 0
+    return {'support': joint, 'confidence': confidence, 
+            'lift': confidence/cons, 'leverage': leverage, 
+            'conviction': conviction, 'chi2': chi2}
+
+def rank_rules(rules,metrics,sort_by='lift',min_values=None):
+    ''' Filter rules on minimum values of their measures and sort them 
+    by one measure, highest first. Return the remaining rules and their 
+    measures
+    
+    param:
+    rules: list of (antecedent, consequent) pairs
+    metrics: measures of the rules from rule_metrics
+    sort_by: name of the measure to sort by
+    min_values: dictionary mapping measure names to their minimum value
+    '''
+    keep = np.ones(len(rules),dtype=bool)
+    for name, value in (min_values or {}).iteritems():
+        keep &= metrics[name] >= value
+    index = np.flatnonzero(keep)
+    index = index[np.argsort(-metrics[sort_by][index],kind='mergesort')]
+    ranked = dict((name, values[index]) for name, values in metrics.iteritems())
+    return [rules[i] for i in index], ranked
+
+class RuleStore(object):
+    ''' Association rules indexed by their items. Antecedents are kept 
+    in a subset trie over their sorted item ids, so the rules matching a
+    record are found by walking only the trie paths the record contains.
+    Consequents are kept in an inverted index from item to rules. A 
+    store saved to disk is read back with marshal on the first query
+    
+    param:
+    path: file of a saved store to load lazily, None for an empty store
+    '''
+    def __init__(self,path=None):
+        self.path = path
+        self._loaded = path is None
+        self._names = []
+        self._ids = {}
+        self._rules = []
+        self._trie = [[], {}] # rule ids ending here, children
+        self._consequents = {}
+        
+    def _load(self):
+        ''' Read the saved store on first use '''
+        if self._loaded:
+            return
+        f = open(self.path,'rb')
+        try:
+            data = marshal.load(f)
+        finally:
+            f.close()
+        self._names, self._rules, self._trie, self._consequents = data
+        self._ids = dict((name, item) for item, name in enumerate(self._names))
+        self._loaded = True
+        
+    def _item_id(self,name):
+        ''' Return the id of an item, adding it if it is new '''
+        if name not in self._ids:
+            self._ids[name] = len(self._names)
+            self._names.append(name)
+        return self._ids[name]
+        
+    def __len__(self):
+        self._load()
+        return len(self._rules)
+        
+    def add(self,antecedent,consequent,support,confidence):
+        ''' Add the rule antecedent ==> consequent
+        
+        param:
+        antecedent, consequent: item names of both sides of the rule
+        support: support of the rule
+        confidence: confidence of the rule
+        '''
+        self._load()
+        rule = len(self._rules)
+        self._rules.append((frozenset(antecedent),frozenset(consequent),
+                            support,confidence))
+        node = self._trie
+        for item in sorted(self._item_id(name) for name in antecedent):
+            node = node[1].setdefault(item,[[], {}])
+        node[0].append(rule)
+        for name in consequent:
+            self._consequents.setdefault(self._item_id(name),[]).append(rule)
+            
+    def match(self,record):
+        ''' Return the rules whose antecedent is contained in a record, 
+        as (antecedent, consequent, support, confidence) tuples
+        
+        param:
+        record: item names of the record
+        '''
+        self._load()
+        items = set(self._ids[name] for name in record if name in self._ids)
+        found = []
+        # Every trie path is sorted, so a path is reached only once by 
+        # following the children on items of the record
+        stack = [self._trie]
+        while len(stack) != 0:
+            rules, children = stack.pop()
+            found.extend(rules)
+            if len(children) <= len(items):
+                for item, child in children.iteritems():
+                    if item in items:
+                        stack.append(child)
+            else:
+                for item in items:
+                    if item in children:
+                        stack.append(children[item])
+        rules = self._rules
+        return [rules[rule] for rule in found]
+                
+    def with_consequent(self,items):
+        ''' Return the rules whose consequent contains all given items
+        
+        param:
+        items: item names
+        '''
+        self._load()
+        found = None
+        for name in items:
+            rules = set(self._consequents.get(self._ids.get(name),()))
+            found = rules if found is None else found & rules
+        return [self._rules[rule] for rule in sorted(found or ())]
+        
+    def save(self,path):
+        ''' Write the store to a file '''
+        self._load()
+        f = open(path,'wb')
+        try:
+            marshal.dump((self._names,self._rules,self._trie,
+                          self._consequents),f)
+        finally:
+            f.close()
  
 ##################################################################
 # DATA PROCESSING
@@ -206,92 +1655,100 @@ def generate_rules(itemset,min_conf,support,transactions):
 ##################################################################
 
 data_url = "https://raw.githubusercontent.com/hizkiafebianto/CSC240/master/Project%201/Apriori/adult.data"
-raw_data = []
-f = urllib2.urlopen(data_url) # create connection with the URL
-for line in f.readlines():
-    temp = []    
-    for item in line.split(','): # split each line by comma
-        temp.append(item.strip()) # strip whitespace from each item
-    raw_data.append(temp)
-del raw_data[len(raw_data)-1]
-
-# Discretize continuous attributes: age, capital-gain, capital-loss,
-# and hours-per-week. Remove insignificant attributes: fnlwgt and 
-# education-num. 
-
-#see value distribution
-age = []
-cap_gain =[]
-cap_loss = []
-hours_perweek = []
-for row in range(0,len(raw_data)-1):
-    age.append(int(raw_data[row][0]))
-    cap_gain.append(int(raw_data[row][10]))
-    cap_loss.append(int(raw_data[row][11]))
-    hours_perweek.append(int(raw_data[row][12]))
-    
-# From the following histogram, we determine the classification of age
-plt.hist(age,10)
-
-# From the following histogram, we know the distribution of cap_loss. 
-# Cap_gain = 0 is ignored here since it is too frequent
-plt.hist(cap_loss,bins=10,range=(1,max(cap_loss)))
-
-# From the following histogram, we might think that cap_gain = 99999 is 
-# a default value so we will eliminate records that has cap_gain = 99999
-plt.hist(cap_gain,bins=10,range=(1,max(cap_gain)))
-cap_gain.count(99999) # There are 159 records 
-
-# Remove records with cap_gain = 99999 and calculate missing values. 
-data = []
-missing_val = 0
-for item in raw_data:
-    if int(item[10]) != 99999:
-        data.append(item[:])
-    if '?' in item:
-        missing_val += 1;
- 
-# Categorization of capital loss using similar frequency bins
-# $0
-# $1-$1700
-# $1701-$2000
-# >$2000
-temp = []
-for row in range(0,len(data)-1):
-    temp.append(int(data[row][11]))
-np.array_split(np.sort(np.array(filter(lambda a:a != 0,temp))),3)
-
-# Categorization of capital gain using similar frequency bins
-# $0
-# $1-$4000
-# $4001-$7700
-# >7700
-temp = []
-for row in range(0,len(data)-1):
-    temp.append(int(data[row][10]))
-np.array_split(np.sort(np.array(filter(lambda a:a != 0,temp))),3)
-
-# Categories for age
-# senior: > 65
-# middle-age: 45 - 65
-# young-adult: < 45
-
-data1 = []
-for row in data:
-    temp = row[:]
-    # Discretize age
-    temp[0] = age_bins(row[0])
-    # Discretize capital gain
-    temp[10] = capgain_bins(row[10])
-    # Discretize capital loss
-    temp[11] = caploss_bins(row[11])
-    # Discretize workhour
-    temp[12] = workhour_bins(row[12])
-    # Delete education_num
-    del temp[4]
-    # Delete fnlwgt
-    del temp[2]
-    data1.append(temp)
+
+def load_data(url):
+    ''' Load the whole data set into memory, show the distributions of
+    the quantitative attributes and return the discretized records. The
+    streaming and Partition (SON) modes read the file themselves and 
+    skip this step
+    '''
+    raw_data = []
+    f = urllib2.urlopen(url) # create connection with the URL
+    for line in f.readlines():
+        temp = []    
+        for item in line.split(','): # split each line by comma
+            temp.append(item.strip()) # strip whitespace from each item
+        raw_data.append(temp)
+    del raw_data[len(raw_data)-1]
+
+    # Discretize continuous attributes: age, capital-gain, capital-loss,
+    # and hours-per-week. Remove insignificant attributes: fnlwgt and 
+    # education-num. 
+
+    #see value distribution
+    age = []
+    cap_gain =[]
+    cap_loss = []
+    hours_perweek = []
+    for row in range(0,len(raw_data)-1):
+        age.append(int(raw_data[row][0]))
+        cap_gain.append(int(raw_data[row][10]))
+        cap_loss.append(int(raw_data[row][11]))
+        hours_perweek.append(int(raw_data[row][12]))
+
+    # From the following histogram, we determine the classification of age
+    plt.hist(age,10)
+
+    # From the following histogram, we know the distribution of cap_loss. 
+    # Cap_gain = 0 is ignored here since it is too frequent
+    plt.hist(cap_loss,bins=10,range=(1,max(cap_loss)))
+
+    # From the following histogram, we might think that cap_gain = 99999 is 
+    # a default value so we will eliminate records that has cap_gain = 99999
+    plt.hist(cap_gain,bins=10,range=(1,max(cap_gain)))
+    cap_gain.count(99999) # There are 159 records 
+
+    # Remove records with cap_gain = 99999 and calculate missing values. 
+    data = []
+    missing_val = 0
+    for item in raw_data:
+        if int(item[10]) != 99999:
+            data.append(item[:])
+        if '?' in item:
+            missing_val += 1;
+
+    # Categorization of capital loss using similar frequency bins
+    # $0
+    # $1-$1700
+    # $1701-$2000
+    # >$2000
+    temp = []
+    for row in range(0,len(data)-1):
+        temp.append(int(data[row][11]))
+    np.array_split(np.sort(np.array(filter(lambda a:a != 0,temp))),3)
+
+    # Categorization of capital gain using similar frequency bins
+    # $0
+    # $1-$4000
+    # $4001-$7700
+    # >7700
+    temp = []
+    for row in range(0,len(data)-1):
+        temp.append(int(data[row][10]))
+    np.array_split(np.sort(np.array(filter(lambda a:a != 0,temp))),3)
+
+    # Categories for age
+    # senior: > 65
+    # middle-age: 45 - 65
+    # young-adult: < 45
+
+    data1 = []
+    for row in data:
+        temp = row[:]
+        # Discretize age
+        temp[0] = age_bins(row[0])
+        # Discretize capital gain
+        temp[10] = capgain_bins(row[10])
+        # Discretize capital loss
+        temp[11] = caploss_bins(row[11])
+        # Discretize workhour
+        temp[12] = workhour_bins(row[12])
+        # Delete education_num
+        del temp[4]
+        # Delete fnlwgt
+        del temp[2]
+        data1.append(temp)
+    return data1
 
 keys = ['age','workclass','education','marital','occupation',\
 'relationsip','race','sex','gain','loss','hours','country','salary']
@@ -305,39 +1762,169 @@ min_sup = input("Input minimum support [0..1] = ")
 min_conf = input("Input minimum confidence [0..1] = ")
 print "Processing... \n"
 
+# Support counting method: 'horizontal' scans every transaction for 
+# every candidate, 'trie' walks each transaction once per level through
+# a prefix trie of the candidates, 'vertical' intersects per-itemset 
+# bitsets, 'numpy' counts whole levels on a packed transaction matrix,
+# 'parallel' counts shards of the transactions in a process pool, 
+# 'ranged' counts the candidates range by range within a memory budget
+counting = 'vertical'
+
+# Number of candidates 'ranged' counting holds in memory in one pass over
+# the transactions
+range_entries = 1000000
+
+# Number of records per chunk for Partition (SON) mining of the data 
+# file, None mines the transactions in memory
+partition_size = None
+
+# Number of transactions in the random sample of the sampling algorithm
+# (Toivonen), None mines all transactions level by level
+sample_size = None
+
+# Number of hash buckets for DHP pruning of the candidate 2-itemsets, 
+# None counts every candidate 2-itemset
+dhp_buckets = None
+
+# Itemsets to report: 'all' frequent itemsets, only 'closed' ones (CHARM)
+# or only 'maximal' ones
+mining = 'all'
+
+# Directory of the result cache of frequent itemsets, None to always 
+# mine, and the maximum size of the cache in bytes
+cache_dir = None
+cache_bytes = 64*2**20
+
+# File to save the rules to as an indexed RuleStore, None to only print
+# them
+rule_store = None
+
+# Measure to rank the printed rules by: 'lift', 'leverage', 'conviction'
+# or 'chi2', None prints them unranked
+rule_ranking = None
+
+# Maximum support error of Lossy Counting over a stream of the data file,
+# None mines exact supports
+stream_epsilon = None
+
 # Record start time 
 start = datetime.datetime.now()
 
-# Each row in the data set will be treated as a transaction
-transactions = []
-for row in data1:
-    temp = []
-    for i, item in enumerate(row):   
-        temp.append('%s=%s'%(keys[i],item))
-    transactions.append(temp[:])
+if stream_epsilon is not None:
+    # Read the data set one record at a time with Lossy Counting, memory
+    # is bounded by the error instead of the number of records. The file
+    # is never loaded as a whole
+    counter = LossyCounter(stream_epsilon)
+    item_ids = {}
+    item_names = []
+    for transaction in read_transactions(data_url,keys):
+        counter.add(encode_transactions([transaction],item_ids,
+                                        item_names)[0][0])
+    itemsets_list = counter.frequent_itemsets(min_sup)
+    n_transactions = counter.n_transactions
+elif partition_size is None:
+    # Each row in the data set will be treated as a transaction
+    data1 = load_data(data_url)
+    transactions = []
+    for row in data1:
+        temp = []
+        for i, item in enumerate(row):   
+            temp.append('%s=%s'%(keys[i],item))
+        transactions.append(temp[:])
 
-# List of itemsets
-itemsets_list = [defaultdict(int)]
+    # Encode every attribute=value item as a dense integer id, item names
+    # are only looked up again when the results are printed
+    transactions, item_names = encode_transactions(transactions)
 
-# Generate a list of frequent 1-itemsets
-for transaction in transactions:
-    for item in transaction:
-        itemsets_list[0][frozenset([item])] += 1;
+    # Collapse identical transactions into (transaction, count) pairs
+    n_transactions = len(transactions)
+    transactions = dedup_transactions(transactions)
 
-# Remove 1-itemsets that have smaller support than minimum support
-for itemset, f in itemsets_list[0].items():
-    if float(f)/len(transactions) < min_sup:
-        del itemsets_list[0][itemset]
+    if sample_size is None:
+        # List of itemsets
+        itemsets_list = [defaultdict(int)]
+        buckets = [0]*dhp_buckets if dhp_buckets else None
 
-# Generate itemsets for k>2
-generate_itemsets(itemsets_list,min_sup,transactions)
+        # Generate a list of frequent 1-itemsets, hashing the item pairs
+        # of every transaction into the DHP buckets in the same scan
+        for transaction, count in transactions:
+            for item in transaction:
+                itemsets_list[0][frozenset([item])] += count;
+            if buckets is not None:
+                hash_pairs(transaction,count,buckets)
 
-# Generating Rules
+        # Remove 1-itemsets that have smaller support than minimum support
+        for itemset, f in itemsets_list[0].items():
+            if float(f)/n_transactions < min_sup:
+                del itemsets_list[0][itemset]
+
+        # Generate itemsets for k>2
+        if mining == 'closed':
+            itemsets_list = split_itemsets(
+                charm(itemsets_list[0],transactions,min_sup))
+        elif mining == 'maximal':
+            itemsets_list = split_itemsets(
+                max_itemsets(itemsets_list[0],transactions,min_sup))
+        elif cache_dir is not None:
+            # Answer from the result cache, a lower min_sup than the 
+            # cached one only counts the itemsets the cache does not have
+            key = cache_key(transactions,item_names)
+            cached = load_cache(cache_dir,key,item_names)
+            if cached is not None and cached[0] <= min_sup:
+                known = cached[1]
+                prune_itemsets(known,min_sup,n_transactions)
+                itemsets_list = split_itemsets(known)
+                print "Itemsets taken from the cache.\n"
+            else:
+                known = cached[1] if cached is not None else {}
+                extend_itemsets(itemsets_list,known,transactions,min_sup)
+                save_cache(cache_dir,key,min_sup,itemsets_list,item_names,
+                           cache_bytes)
+        else:
+            pruned = generate_itemsets(itemsets_list,min_sup,transactions,
+                                       counting,buckets=buckets,
+                                       range_entries=range_entries)
+            if buckets is not None:
+                frequent = sum(1 for b in buckets if float(b)/n_transactions >= min_sup)
+                print "DHP: {0} of {1} buckets reached min_sup, {2} candidate 2-itemsets pruned.\n".format(frequent,len(buckets),pruned)
+    else:
+        # Mine a random sample and verify the result with full scans
+        itemsets_list, passes = sample_mining(transactions,min_sup,
+                                              sample_size,counting=counting)
+        print "Sampling needed {} full scan(s) of the data.\n".format(passes)
+else:
+    # Stream the data set twice with the Partition (SON) algorithm, only
+    # one chunk of records is held in memory at a time
+    itemsets_list, n_transactions, item_names = son_mining(
+        data_url,min_sup,partition_size,keys,counting)
+
+# Generating Rules. Closed itemsets carry the support of all frequent 
+# itemsets, maximal itemsets do not, so no rules are generated from them
+table = support_table(itemsets_list)
+if mining == 'closed':
+    fill_supports(table)
 rules = []
 for itemsets in (reversed(itemsets_list)):
-    if len(itemsets) != 0:  
+    if len(itemsets) != 0 and mining != 'maximal':  
         for item in itemsets.keys():
-            rules.append(generate_rules(item, min_conf, itemsets[item],transactions))
+            rules.append(generate_rules(item, min_conf, table))
+
+# Rank the rules by an interestingness measure
+if rule_ranking is not None:
+    pairs = [(a, b) for item in rules for a, b in item.items()]
+    pairs, metrics = rank_rules(pairs,rule_metrics(pairs,table,n_transactions),
+                                rule_ranking)
+
+# Save the rules in an indexed rule store for later queries
+if rule_store is not None:
+    store = RuleStore()
+    for item in rules:
+        for a, b in item.items():
+            itemset = a | b
+            store.add(decode_itemset(a,item_names),decode_itemset(b,item_names),
+                      float(table[itemset])/n_transactions,
+                      calc_conf(a,itemset,table))
+    store.save(rule_store)
 
 # Record finish time
 finish = datetime.datetime.now()
@@ -347,14 +1934,21 @@ for idx, item in enumerate(itemsets_list):
     if len(item) != 0:
         print "Itemsets of size %d:\n"%(idx + 1)
         for a, freq in item.items():
-            print "{0}  support:{1:.1%}\n".format(list(a),float(freq)/len(transactions))
+            print "{0}  support:{1:.1%}\n".format(decode_itemset(a,item_names),float(freq)/n_transactions)
         print "\n"
 
 # Print rules
-for idx, item in enumerate(rules):
-    if len(item) != 0:
-        for a, b in item.items():
-            print "{0} ==> {1}\n".format(list(a),list(b))
+if rule_ranking is None:
+    for idx, item in enumerate(rules):
+        if len(item) != 0:
+            for a, b in item.items():
+                print "{0} ==> {1}\n".format(decode_itemset(a,item_names),decode_itemset(b,item_names))
+else:
+    for idx, (a, b) in enumerate(pairs):
+        print "{0} ==> {1}  lift:{2:.2f} leverage:{3:.3f} conviction:{4:.2f} chi2:{5:.1f}\n".format(
+            decode_itemset(a,item_names),decode_itemset(b,item_names),
+            metrics['lift'][idx],metrics['leverage'][idx],
+            metrics['conviction'][idx],metrics['chi2'][idx])
 
 # Showing time spent
 print "The operation took {}.".format(finish-start)
@@ -379,13 +1973,16 @@ ms = float(2)/9
 # minimum confidence
 mc = 0.7
 
+# Collapse identical transactions into (transaction, count) pairs
+D = dedup_transactions(T)
+
 # 1-itemsets
 C_list = [defaultdict(int)]
 
 # Generate a list of frequent 1-itemsets
-for t in T:
+for t, count in D:
     for item in t:
-        C_list[0][frozenset([item])] += 1;
+        C_list[0][frozenset([item])] += count;
 
 # Remove 1-itemsets that have smaller support than minimum support
 for itemset, f in C_list[0].items():
@@ -393,14 +1990,15 @@ for itemset, f in C_list[0].items():
         del C_list[0][itemset]
 
 # Generate itemsets for k>2
-generate_itemsets(C_list,ms,T)
+generate_itemsets(C_list,ms,D)
 
 # Generating Rules
+table = support_table(C_list)
 rules = []
 for itemsets in (reversed(C_list)):
     if len(itemsets) != 0:  
         for item in itemsets.keys():
-            rules.append(generate_rules(item, mc, itemsets[item],T))
+            rules.append(generate_rules(item, mc, table))
 
 # Print frequent itemsets
 for idx, item in enumerate(C_list):
@@ -416,6 +2014,17 @@ for idx, item in enumerate(rules):
         for a, b in item.items():
             print "{0} ==> {1}\n".format(list(a),list(b))
 
+# Lossy Counting queried after every transaction reports the same 
+# itemsets as a counter that is queried once at the end
+counter = LossyCounter(0.25,batch_buckets=1)
+queried = LossyCounter(0.25,batch_buckets=1)
+for t in T:
+    counter.add(t)
+    queried.add(t)
+    queried.frequent_itemsets(ms)
+print "Lossy Counting unchanged by queries: {0}\n".format(
+    counter.frequent_itemsets(ms) == queried.frequent_itemsets(ms))
+
 
 
     
@@ -92,19 +92,59 @@ def workhour_bins(workhour):
         elif int(workhour) > 40:
             return 'overtime'
 
+def encode_transactions(transactions):
+    '''Map every item to a dense integer id. Return the transactions
+    as sorted lists of ids and the list of item names indexed by id
+    
+    param:
+    transactions: transaction data base of item names
+    '''
+    item_ids = {}
+    item_names = []
+    encoded = []
+    for transaction in transactions:
+        temp = []
+        for item in transaction:
+            if item not in item_ids:
+                item_ids[item] = len(item_names)
+                item_names.append(item)
+            temp.append(item_ids[item])
+        temp.sort()
+        encoded.append(temp)
+    return encoded, item_names
+
+def dedup_transactions(transactions):
+    '''Collapse identical transactions into (transaction, count) pairs
+    
+    param:
+    transactions: transaction data base
+    '''
+    counts = defaultdict(int)
+    order = []
+    for transaction in transactions:
+        key = tuple(sorted(transaction))
+        if key not in counts:
+            order.append(key)
+        counts[key] += 1
+    return [(list(key), counts[key]) for key in order]
+
+def decode_itemset(itemset,item_names):
+    '''Return the names of the items in an encoded itemset
+    '''
+    return [item_names[item] for item in sorted(itemset)]
+
 def has_infrequent_subset(a_set,itemsets):
     '''Checking if there is a subset of an itemset a_set that is 
     infrequent
     
     param: 
     a_set: the set being examined
-    itemsets: list of frequent (k-1)-itemsets
+    itemsets: set of frequent (k-1)-itemsets as frozensets
     '''
-    val = False
     for combination in combinations(a_set,len(a_set)-1):
-        if set(combination) not in itemsets:
-                val = True
-    return val
+        if frozenset(combination) not in itemsets:
+            return True
+    return False
         
     
 def apriori_gen(itemsets):
@@ -113,108 +153,213 @@ def apriori_gen(itemsets):
     param:
     itemsets: frequent k-itemsets
     '''
-    sets = itemsets.keys()
+    sets = sorted(tuple(sorted(itemset)) for itemset in itemsets)
+    frequent = set(frozenset(itemset) for itemset in sets)
     new_itemsets = []
     k = len(sets[0])  # length of the itemsets
     # making sure all the itemsets have the same length
     assert(all(len(itemset) == k for itemset in sets))
-    for idx, itemset in enumerate(sets):
-        k_minus_one = sorted(itemset)[:k-1]
-        for i in range(idx+1,len(sets)):
-            if k_minus_one == sorted(sets[i])[:k-1]:
-                union = set(sets[idx]).union(set(sets[i]))
+    # Only itemsets sharing their first k-1 items can be joined, group
+    # the sorted itemsets by that prefix
+    groups = defaultdict(list)
+    for itemset in sets:
+        groups[itemset[:-1]].append(itemset[-1])
+    for prefix, last_items in groups.iteritems():
+        for idx, item in enumerate(last_items):
+            for other in last_items[idx+1:]:
+                union = prefix + (item, other)
                 #prune itemsets
-                if not(has_infrequent_subset(union,sets)):
-                    new_itemsets.append(union)
+                if not(has_infrequent_subset(union,frequent)):
+                    new_itemsets.append(frozenset(union))
                 
     return new_itemsets
 
 
-def prune_itemsets(itemsets,min_sup,transactions):
+def hash_pairs(transaction,count,buckets):
+    ''' DHP: hash every pair of items of a transaction into a bucket 
+    and add the transaction count to that bucket
+    
+    param:
+    transaction: a transaction
+    count: number of times the transaction occurs
+    buckets: list of bucket counts
+    '''
+    for pair in combinations(sorted(transaction),2):
+        buckets[hash(pair) % len(buckets)] += count
+
+def dhp_prune(itemsets,buckets,min_sup,n_transactions):
+    ''' DHP: remove candidate 2-itemsets whose bucket count does not 
+    meet min_sup, since no pair in such a bucket can be frequent. Return
+    the remaining candidates and the number of pruned ones
+    
+    param:
+    itemsets: candidate 2-itemsets
+    buckets: list of bucket counts filled by hash_pairs
+    min_sup: minimum support value of a frequent itemset
+    n_transactions: number of transactions in the data base
+    '''
+    kept = []
+    for itemset in itemsets:
+        bucket = hash(tuple(sorted(itemset))) % len(buckets)
+        if float(buckets[bucket])/n_transactions >= min_sup:
+            kept.append(itemset)
+    return kept, len(itemsets) - len(kept)
+
+def prune_itemsets(itemsets,min_sup,n_transactions):
     ''' Remove itemsets that do not meet the min_sup
     
     param:
     itemsets: itemset being examined
-    transaction: list of all transactions
     min_sup: minimum support value of a frequent itemset 
+    n_transactions: number of transactions in the original data base
     '''
     for itemset, f in itemsets.items():
-        if float(f)/len(transactions) < min_sup:
+        if float(f)/n_transactions < min_sup:
             del itemsets[itemset] 
     
-def generate_itemsets(itemsets_list, min_sup, transactions):
+def generate_itemsets(itemsets_list, min_sup, transactions, buckets=None):
     ''' Generate all frequent itemsets with length more than 1
-    in the apriori algoritm 
+    in the apriori algoritm. The transaction data base is reduced in 
+    place after every level. Return a list of (k, removed transactions,
+    removed items, remaining transactions) for every level and the 
+    number of candidate 2-itemsets pruned by the DHP buckets
     
     param:
     itemsets_list: a list of 1-itemsets, 2-itemsets, ... , k-itemsets
     min_sup: minimum support value of a frequent itemset
-    transactions: transaction data base
+    transactions: list of (transaction, count) pairs
+    buckets: DHP bucket counts of the item pairs filled by hash_pairs 
+    during the 1-itemset scan, None to count every candidate 2-itemset
     '''
+    n_transactions = sum(count for transaction, count in transactions)
     L = itemsets_list[0]
     k = len(itemsets_list)
+    reductions = []
+    pruned = 0
+    ### Improvement ###
+    rows, items = reduce_transactions(L,transactions)
+    reductions.append((k,rows,items,len(transactions)))
     while(len(L) != 0): 
         try:
             next_itemsets = apriori_gen(L)
         except IndexError:
-            return
+            return reductions, pruned
+        
+        if buckets is not None and k == 1:
+            next_itemsets, pruned = dhp_prune(next_itemsets,buckets,
+                                              min_sup,n_transactions)
         
         temp = defaultdict(int)
         for itemset in next_itemsets:
-            for transaction in transactions:
+            for transaction, count in transactions:
                 if itemset.issubset(transaction):
-                    temp[frozenset(itemset)] += 1
+                    temp[frozenset(itemset)] += count
                 
-        prune_itemsets(temp,min_sup,transactions)
-        reduce_transactions(temp,transactions) ### Improvement ###
-        
+        prune_itemsets(temp,min_sup,n_transactions)
         itemsets_list.append(temp)
         k += 1
         L = itemsets_list[k-1]
         
-def calc_conf(x,transactions,support):
-    '''Calculate support of an itemset x in the transaction
+        ### Improvement ###
+        rows, items = reduce_transactions(temp,transactions)
+        reductions.append((k,rows,items,len(transactions)))
+    return reductions, pruned
+        
+def support_table(itemsets_list):
+    '''Merge the frequent itemsets of every size into one dictionary
+    that maps each itemset to its support count
     '''
-    i = 0
-    for transaction in transactions:
-        if x.issubset(set(transaction)):
-            i += 1;
-    return support/(float(i)/len(transactions))
+    table = {}
+    for itemsets in itemsets_list:
+        table.update(itemsets)
+    return table
+
+def calc_conf(x,itemset,table):
+    '''Calculate the confidence of the rule x ==> itemset - x using the
+    support counts in the support table
+    '''
+    return float(table[itemset])/table[frozenset(x)]
 
 ### Improvement ###
 def reduce_transactions(itemsets,transactions):
-    ''' Remove transactions that do not contain any frequent itemsets   
+    ''' Compact the transaction data base in place after level k. 
+    An item can only be part of a frequent (k+1)-itemset in a 
+    transaction if it appears in at least k frequent k-itemsets of that
+    transaction, other items are removed. Transactions left with fewer
+    than k+1 items cannot contain any frequent (k+1)-itemset and are 
+    removed. Return the number of removed transactions and items
+    
+    param:
+    itemsets: frequent k-itemsets
+    transactions: list of (transaction, count) pairs
     '''
-    temp = []
-    for transaction in transactions:
-        subset = False    
-        for key in itemsets.keys():
-            if set(key).issubset(set(transaction)):
-                subset = True
-                break
-        if subset:
-            temp.append(transaction)
-    transactions = temp
+    if len(itemsets) == 0:
+        rows = len(transactions)
+        items = sum(len(t) for t, count in transactions)
+        del transactions[:]
+        return rows, items
+    k = len(iter(itemsets).next())
+    removed_items = 0
+    kept = 0
+    for transaction, count in transactions:
+        hits = defaultdict(int)
+        # Enumerate whichever is smaller: the k-subsets of the 
+        # transaction or the frequent k-itemsets
+        if n_combinations(len(transaction),k) <= len(itemsets):
+            for combination in combinations(transaction,k):
+                if frozenset(combination) in itemsets:
+                    for item in combination:
+                        hits[item] += 1
+        else:
+            items = set(transaction)
+            for itemset in itemsets:
+                if itemset.issubset(items):
+                    for item in itemset:
+                        hits[item] += 1
+        temp = [item for item in transaction if hits[item] >= k]
+        removed_items += len(transaction) - len(temp)
+        if len(temp) > k:
+            transactions[kept] = (temp, count)
+            kept += 1
+        else:
+            removed_items += len(temp)
+    rows = len(transactions) - kept
+    del transactions[kept:]
+    return rows, removed_items
+
+def n_combinations(n,k):
+    ''' Return the number of k-subsets of a set of n items
+    '''
+    if k > n:
+        return 0
+    result = 1
+    for i in range(min(k,n-k)):
+        result = result*(n-i)/(i+1)
+    return result
     
-def generate_rules(itemset,min_conf,support,transactions):
-    '''Generates rules from a frequent itemset. 
+def generate_rules(itemset,min_conf,table):
+    '''Generates rules from a frequent itemset. Consequents are grown
+    one item at a time with apriori_gen. Moving an item from the 
+    antecedent to the consequent cannot raise the confidence, so a 
+    consequent that fails min_conf is never extended.
     
     param:
-    support = support value of the itemset. 
     itemset = a frequent itemset 
     min_conf = minimum confidence
-    transactions = transaction data set
+    table = support counts of all frequent itemsets
     '''
     rules = defaultdict(set)
-    k = {}
-    n = len(itemset)
-    while n > 0:
-        for combination in combinations(itemset,n-1):
-            if (len(combination)!=0):
-                if calc_conf(set(combination),transactions,support) >= min_conf:
-                    k = itemset - set(combination)
-                    rules[frozenset(combination)] = (frozenset(k))
-        n += -1;       
+    consequents = [frozenset([item]) for item in itemset]
+    while len(consequents) != 0 and len(consequents[0]) < len(itemset):
+        passed = []
+        for consequent in consequents:
+            antecedent = itemset - consequent
+            if calc_conf(antecedent,itemset,table) >= min_conf:
+                rules[antecedent] = consequent
+                passed.append(consequent)
+        if len(passed) == 0:
+            break
+        consequents = apriori_gen(passed)
     return rules
  
 ##################################################################
@@ -335,32 +480,49 @@ for row in data1:
         temp.append('%s=%s'%(keys[i],item))
     transactions.append(temp)
 
+# Encode every attribute=value item as a dense integer id, item names
+# are only looked up again when the results are printed
+transactions, item_names = encode_transactions(transactions)
+
+# Collapse identical transactions into (transaction, count) pairs. The 
+# transaction data base also shrinks while mining, keep its original size
+n_transactions = len(transactions)
+transactions = dedup_transactions(transactions)
+
+# Number of hash buckets for DHP pruning of the candidate 2-itemsets, 
+# None counts every candidate 2-itemset
+dhp_buckets = None
+
 # List of itemsets
 itemsets_list = [defaultdict(int)]
+buckets = [0]*dhp_buckets if dhp_buckets else None
 
-# Generate a list of frequent 1-itemsets
-for transaction in transactions:
+# Generate a list of frequent 1-itemsets, hashing the item pairs of 
+# every transaction into the DHP buckets in the same scan
+for transaction, count in transactions:
     for item in transaction:
-        itemsets_list[0][frozenset([item])] += 1;
+        itemsets_list[0][frozenset([item])] += count;
+    if buckets is not None:
+        hash_pairs(transaction,count,buckets)
 
 # Remove 1-itemsets that have smaller support than minimum support
 for itemset, f in itemsets_list[0].items():
-    if float(f)/len(transactions) < min_sup:
+    if float(f)/n_transactions < min_sup:
         del itemsets_list[0][itemset]
 
 ### Improvements ###
-# Delete transactions that do not contain frequent 1-itemsets
-reduce_transactions(itemsets_list[0],transactions)
-
-# Generate itemsets for k>2
-generate_itemsets(itemsets_list,min_sup,transactions)
+# Generate itemsets for k>2, deleting transactions and items that 
+# cannot contain frequent itemsets of the next level
+reductions, pruned = generate_itemsets(itemsets_list,min_sup,transactions,
+                                       buckets)
 
 # Generating Rules
+table = support_table(itemsets_list)
 rules = []
 for itemsets in (reversed(itemsets_list)):
     if len(itemsets) != 0:  
         for item in itemsets.keys():
-            rules.append(generate_rules(item, min_conf, itemsets[item],transactions))
+            rules.append(generate_rules(item, min_conf, table))
 
 # Record finish time
 finish = datetime.datetime.now()
@@ -370,7 +532,7 @@ for idx, item in enumerate(itemsets_list):
     if len(item) != 0:
         print "Itemsets of size %d:\n"%(idx + 1)
         for a, freq in item.items():
-            print "{0}  support:{1:.1%}\n".format(list(a),float(freq)/len(transactions))
+            print "{0}  support:{1:.1%}\n".format(decode_itemset(a,item_names),float(freq)/n_transactions)
         print "\n"
 
 # Print rules
@@ -378,8 +540,17 @@ for idx, item in enumerate(itemsets_list):
 for idx, item in enumerate(rules):
     if len(item) != 0:
         for a, b in item.items():
-            print "{0} ==> {1}\n".format(list(a),list(b))
+            print "{0} ==> {1}\n".format(decode_itemset(a,item_names),decode_itemset(b,item_names))
         
+# Print transaction reduction per level
+for k, rows, items, remaining in reductions:
+    print "After level {0}: removed {1} transactions and {2} items, {3} transactions left\n".format(k,rows,items,remaining)
+
+# Print DHP bucket statistics
+if buckets is not None:
+    frequent = sum(1 for b in buckets if float(b)/n_transactions >= min_sup)
+    print "DHP: {0} of {1} buckets reached min_sup, {2} candidate 2-itemsets pruned.\n".format(frequent,len(buckets),pruned)
+
 # Showing time spent
 print "The operation took {}.".format(finish-start)
 print 
@@ -403,28 +574,32 @@ ms = float(2)/9
 # minimum confidence
 mc = 0.7
 
+# Collapse identical transactions into (transaction, count) pairs
+D = dedup_transactions(T)
+
 # 1-itemsets
 C_list = [defaultdict(int)]
 
 # Generate a list of frequent 1-itemsets
-for t in T:
+for t, count in D:
     for item in t:
-        C_list[0][frozenset([item])] += 1;
+        C_list[0][frozenset([item])] += count;
 
 # Remove 1-itemsets that have smaller support than minimum support
 for itemset, f in C_list[0].items():
     if float(f)/len(T) < ms:
         del C_list[0][itemset]
 
-# Generate itemsets for k>2
-generate_itemsets(C_list,ms,T)
+# Generate itemsets for k>2, D is reduced in place
+generate_itemsets(C_list,ms,D)
 
 # Generating Rules
+table = support_table(C_list)
 rules = []
 for itemsets in (reversed(C_list)):
     if len(itemsets) != 0:  
         for item in itemsets.keys():
-            rules.append(generate_rules(item, mc, itemsets[item],T))
+            rules.append(generate_rules(item, mc, table))
 
 # Print frequent itemsets
 for idx, item in enumerate(C_list):
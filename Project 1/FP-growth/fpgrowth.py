@@ -10,9 +10,17 @@ http://archive.ics.uci.edu/ml/datasets/Adult
 
 """
 # LIBRARIES
-from collections import defaultdict, namedtuple
+from collections import defaultdict, deque, namedtuple
+from itertools import combinations
 import urllib2
 import datetime
+import glob
+import hashlib
+import heapq
+import multiprocessing
+import os
+import struct
+import zlib
 
 ##################################################################
 # TREE STRUCTURE
@@ -24,6 +32,11 @@ import datetime
 class FPNode(object):
     """A node in an FP tree."""
 
+    # Trees grow to hundreds of thousands of nodes, slots keep every node
+    # small and its attributes fast to reach.
+    __slots__ = ('_tree', '_item', '_count', '_parent', '_children',
+                 '_neighbor', '_previous')
+
     def __init__(self, tree, item, count=1):
         self._tree = tree
         self._item = item
@@ -31,26 +44,26 @@ class FPNode(object):
         self._parent = None
         self._children = {}
         self._neighbor = None
+        self._previous = None
 
     def add(self, child):
         """Add the given FPNode `child` as a child of this node."""
+        if not child._item in self._children:
+            self._children[child._item] = child
+            child._parent = self
 
-        if not isinstance(child, FPNode):
-            raise TypeError("Can only add other FPNodes as children")
-
-        if not child.item in self._children:
-            self._children[child.item] = child
-            child.parent = self
+    def remove(self, child):
+        """Remove the given FPNode `child` from the children of this node."""
+        if self._children.get(child._item) is child:
+            del self._children[child._item]
+            child._parent = None
 
     def search(self, item):
         """
         Check whether this node contains a child node for the given item.
         If so, that node is returned; otherwise, `None` is returned.
         """
-        try:
-            return self._children[item]
-        except KeyError:
-            return None
+        return self._children.get(item)
 
     def __contains__(self, item):
         return item in self._children
@@ -60,11 +73,6 @@ class FPNode(object):
         """True if this node is the root of a tree; false if otherwise."""
         return self._item is None and self._count is None
         
-    @property
-    def item(self):
-        """The item contained in this node."""
-        return self._item
-        
     @property
     def tree(self):
         """The tree in which this node appears."""
@@ -80,11 +88,11 @@ class FPNode(object):
         """The count associated with this node's item."""
         return self._count
     
-    def increment(self):
+    def increment(self, count=1):
         """Increment the count associated with this node's item."""
         if self._count is None:
             raise ValueError("Root nodes have no associated count.")
-        self._count += 1
+        self._count += count
     
     @property
     def parent(self):
@@ -93,10 +101,6 @@ class FPNode(object):
 
     @parent.setter
     def parent(self, value):
-        if value is not None and not isinstance(value, FPNode):
-            raise TypeError("A node must have an FPNode as a parent.")
-        if value and value.tree is not self.tree:
-            raise ValueError("Cannot have a parent from another tree.")
         self._parent = value
 
     @property
@@ -109,10 +113,6 @@ class FPNode(object):
 
     @neighbor.setter
     def neighbor(self, value):
-        if value is not None and not isinstance(value, FPNode):
-            raise TypeError("A node must have an FPNode as a neighbor.")
-        if value and value.tree is not self.tree:
-            raise ValueError("Cannot have a neighbor from another tree.")
         self._neighbor = value
 
     @property
@@ -144,21 +144,24 @@ class FPTree(object):
         """The root node of the tree."""
         return self._root
 
-    def add(self, transaction):
-        """Add a transaction to the tree."""
+    def add(self, transaction, count=1):
+        """Add a transaction that occurs `count` times to the tree."""
         point = self._root
 
+        # The node attributes are used directly, this is the hot path of
+        # building every tree.
         for item in transaction:
-            next_point = point.search(item)
-            if next_point:
+            next_point = point._children.get(item)
+            if next_point is not None:
                 # There is already a node in this tree for the current
                 # transaction item; reuse it.
-                next_point.increment()
+                next_point._count += count
             else:
                 # Create a new point and add it as a child of the point we're
                 # currently looking at.
-                next_point = FPNode(self, item)
-                point.add(next_point)
+                next_point = FPNode(self, item, count)
+                point._children[item] = next_point
+                next_point._parent = point
 
                 # Update the route of nodes that contain this item to include
                 # our new node.
@@ -166,17 +169,62 @@ class FPTree(object):
 
             point = next_point
 
+    def remove(self, transaction, count=1):
+        """
+        Remove a transaction that was added `count` times with the same item
+        order. Nodes whose count drops to zero are cut from the tree and 
+        from the route of their item.
+        """
+        point = self._root
+        path = []
+        for item in transaction:
+            point = point.search(item)
+            if point is None:
+                raise ValueError("Transaction is not in the tree.")
+            path.append(point)
+        
+        for i, point in enumerate(path):
+            point.increment(-count)
+            if point.count == 0:
+                # The counts below a node never exceed its own, so the 
+                # rest of the path is emptied too
+                point.parent.remove(point)
+                for node in path[i:]:
+                    if node is not point:
+                        node.increment(-count)
+                    self._remove_link(node)
+                break
+
+    def _remove_link(self, point):
+        """Remove the given node from the route through all nodes for its
+        item."""
+        link = self._links[point.item]
+        previous = point._previous
+        neighbor = point._neighbor
+        if neighbor is not None:
+            neighbor._previous = previous
+        if previous is not None:
+            previous._neighbor = neighbor
+        point._neighbor = None
+        point._previous = None
+
+        head = neighbor if link.head is point else link.head
+        tail = previous if link.tail is point else link.tail
+        if head is None:
+            del self._links[point.item]
+        else:
+            self._links[point.item] = self.Links(head, tail)
+
     def _update_links(self, point):
         """Add the given node to the route through all nodes for its item."""
-        assert self is point.tree
-
-        try:
-            link = self._links[point.item]
-            link[1].neighbor = point 
-            self._links[point.item] = self.Links(link[0], point)
-        except KeyError:
+        link = self._links.get(point._item)
+        if link is not None:
+            link[1]._neighbor = point 
+            point._previous = link[1]
+            self._links[point._item] = self.Links(link[0], point)
+        else:
             # First node for this item; start a new route.
-            self._links[point.item] = self.Links(point, point)
+            self._links[point._item] = self.Links(point, point)
 
     def items(self):
         """
@@ -197,18 +245,20 @@ class FPTree(object):
         except KeyError:
             return
 
-        while node:
+        while node is not None:
             yield node
-            node = node.neighbor
+            node = node._neighbor
 
     def prefix_paths(self, item):
         """Generate the prefix paths that end with the given item."""
 
+        root = self._root
+
         def collect_path(node):
             path = []
-            while node and not node.root:
+            while node is not None and node is not root:
                 path.append(node)
-                node = node.parent
+                node = node._parent
             path.reverse()
             return path
 
@@ -286,43 +336,458 @@ def workhour_bins(workhour):
         elif int(workhour) > 40:
             return 'overtime'
 
-def fp_growth(tree, suffix, min_sup, T):
+def encode_transactions(transactions):
+    '''Map every item to a dense integer id. Return the transactions
+    as sorted lists of ids and the list of item names indexed by id
+    
+    param:
+    transactions: transaction data base of item names
+    '''
+    item_ids = {}
+    item_names = []
+    encoded = []
+    for transaction in transactions:
+        temp = []
+        for item in transaction:
+            if item not in item_ids:
+                item_ids[item] = len(item_names)
+                item_names.append(item)
+            temp.append(item_ids[item])
+        temp.sort()
+        encoded.append(temp)
+    return encoded, item_names
+
+def dedup_transactions(transactions):
+    '''Collapse identical transactions into (transaction, count) pairs
+    
+    param:
+    transactions: transaction data base
+    '''
+    counts = defaultdict(int)
+    order = []
+    for transaction in transactions:
+        key = tuple(sorted(transaction))
+        if key not in counts:
+            order.append(key)
+        counts[key] += 1
+    return [(list(key), counts[key]) for key in order]
+
+def decode_itemset(itemset,item_names):
+    '''Return the names of the items in an encoded itemset
+    '''
+    return [item_names[item] for item in sorted(itemset)]
+
+def cache_key(transactions,item_names):
+    ''' Return a content hash of a transaction data base that does not 
+    depend on the order of the transactions or on the item ids
+    
+    param:
+    transactions: list of (transaction, count) pairs
+    item_names: names of the item ids
+    '''
+    rows = sorted('%d:%s'%(count,','.join(sorted(item_names[item] 
+                                                  for item in transaction)))
+                  for transaction, count in transactions)
+    return hashlib.sha1('\n'.join(rows)).hexdigest()
+
+def save_cache(cache_dir,key,min_sup,patterns,item_names,max_bytes):
+    ''' Store frequent patterns and their supports in the result cache 
+    under the key of their data base. The file holds the minimum 
+    support, a table of the item names and every pattern as its length,
+    item indices and support, packed with struct and compressed with 
+    zlib. The least recently used files are evicted while the cache is 
+    larger than max_bytes
+    
+    param:
+    cache_dir: directory of the cache files
+    key: content hash of the data base from cache_key
+    min_sup: minimum support the patterns were mined at
+    patterns: dictionary of frequent patterns and their supports
+    item_names: names of the item ids
+    max_bytes: maximum size of all cache files together
+    '''
+    index = {}
+    names = []
+    records = []
+    for pattern, support in patterns.iteritems():
+        ids = []
+        for item in sorted(pattern):
+            if item not in index:
+                index[item] = len(names)
+                names.append(item_names[item])
+            ids.append(index[item])
+        records.append(struct.pack('<B%dHI'%len(ids),len(ids),
+                                   *(ids + [support])))
+    data = [struct.pack('<dI',min_sup,len(names))]
+    for name in names:
+        data.append(struct.pack('<H',len(name)) + name)
+    data.append(struct.pack('<I',len(records)))
+    data.extend(records)
+    if not os.path.isdir(cache_dir):
+        os.makedirs(cache_dir)
+    path = os.path.join(cache_dir,key + '.cache')
+    f = open(path + '.tmp','wb')
+    try:
+        f.write(zlib.compress(''.join(data)))
+    finally:
+        f.close()
+    os.rename(path + '.tmp',path)
+    evict_cache(cache_dir,max_bytes)
+
+def load_cache(cache_dir,key,item_names):
+    ''' Return the minimum support and the dictionary of patterns with 
+    their supports stored for a data base, or None if it is not in the 
+    cache
+    
+    param:
+    cache_dir: directory of the cache files
+    key: content hash of the data base from cache_key
+    item_names: names of the item ids of the current run
+    '''
+    path = os.path.join(cache_dir,key + '.cache')
+    if not os.path.exists(path):
+        return None
+    f = open(path,'rb')
+    try:
+        data = zlib.decompress(f.read())
+    finally:
+        f.close()
+    # Mark the file as recently used
+    os.utime(path,None)
+    item_ids = dict((name, item) for item, name in enumerate(item_names))
+    min_sup, n_names = struct.unpack_from('<dI',data)
+    pos = struct.calcsize('<dI')
+    ids = []
+    for i in range(n_names):
+        length, = struct.unpack_from('<H',data,pos)
+        pos += 2
+        ids.append(item_ids[data[pos:pos+length]])
+        pos += length
+    n_patterns, = struct.unpack_from('<I',data,pos)
+    pos += 4
+    patterns = {}
+    for i in range(n_patterns):
+        k, = struct.unpack_from('<B',data,pos)
+        fmt = '<B%dHI'%k
+        record = struct.unpack_from(fmt,data,pos)
+        pos += struct.calcsize(fmt)
+        patterns[frozenset(ids[j] for j in record[1:-1])] = record[-1]
+    return min_sup, patterns
+
+def evict_cache(cache_dir,max_bytes):
+    ''' Delete the least recently used cache files until the cache 
+    holds at most max_bytes, the newest file is always kept
+    '''
+    files = []
+    for path in glob.glob(os.path.join(cache_dir,'*.cache')):
+        files.append((os.path.getmtime(path),os.path.getsize(path),path))
+    files.sort()
+    total = sum(size for mtime, size, path in files)
+    while total > max_bytes and len(files) > 1:
+        mtime, size, path = files.pop(0)
+        os.remove(path)
+        total -= size
+
+def fp_growth(tree, suffix, min_sup, n_transactions):
+    # The items of a single prefix path occur nowhere else in the tree, 
+    # so every combination of its frequent nodes is a pattern with the 
+    # count of its deepest node. Only the multipath part below the path
+    # needs conditional trees, whose prefix paths still run through the
+    # single path and give the patterns combining both parts.
+    path = single_prefix_path(tree)
+    for s in prefix_path_patterns(path, suffix, min_sup*n_transactions):
+        yield s
+    path_items = set(node.item for node in path)
+    
     for item, nodes in tree.items():
+        if item in path_items:
+            continue
         support = sum(n.count for n in nodes)
-        if support >= (min_sup*len(T)) and item not in suffix:
+        if support >= (min_sup*n_transactions) and item not in suffix:
             beta = [item] + suffix
             yield (beta, support)
-            cond_tree = conditional_fptree(tree.prefix_paths(item))
-            for s in fp_growth(cond_tree, beta, min_sup, T):
+            cond_tree = conditional_fptree(tree.prefix_paths(item),
+                                           min_sup*n_transactions)
+            for s in fp_growth(cond_tree, beta, min_sup, n_transactions):
                 yield s
             
-def conditional_fptree(paths):
-    """ Build a conditional FPTree"""    
+def prefix_path_patterns(path, suffix, min_count):
+    """Generate every combination of the frequent nodes of a single prefix
+    path, with the suffix, as a pattern with the count of its deepest node"""
+    prefix = [node for node in path 
+              if node.count >= min_count and node.item not in suffix]
+    for k in range(1, len(prefix) + 1):
+        for nodes in combinations(prefix, k):
+            yield ([node.item for node in nodes] + suffix, nodes[-1].count)
+
+def conditional_base(paths):
+    """Return the conditional pattern base of an item from its prefix 
+    paths, as (items, count) pairs of the items above the item and the 
+    count of the item"""
+    return [([node.item for node in path[:-1]], path[-1].count) 
+            for path in paths]
+
+def conditional_fptree(paths, min_count=0):
+    """ Build a conditional FPTree from the prefix paths of an item"""
+    return base_fptree(conditional_base(paths), min_count)
+
+def base_fptree(base, min_count=0):
+    """ 
+    Build an FPTree from a conditional pattern base. The items of the base
+    are counted first and the ones below min_count are dropped. Every path
+    is then inserted once with its count, its items sorted by descending 
+    local support and then by item, the order the FP-tree miners process 
+    trees in.
+    """
+    supports = defaultdict(int)
+    for items, count in base:
+        for item in items:
+            supports[item] += count
+    
     tree = FPTree()
-    suffix_item = None
+    for items, count in base:
+        items = [item for item in items if supports[item] >= min_count]
+        items.sort(key=lambda x: (-supports[x], x))
+        tree.add(items, count)
+    return tree
+
+def item_supports(tree, suffix):
+    """Return (item, support) for every item in the tree not in suffix"""
+    return [(item, sum(n.count for n in nodes)) 
+            for item, nodes in tree.items() if item not in suffix]
+
+def single_prefix_path(tree):
+    """Return the nodes of the tree from the root down to its first 
+    branch"""
+    path = []
+    node = tree.root
+    while len(node._children) == 1:
+        node = node._children.itervalues().next()
+        path.append(node)
+    return path
+
+def single_path(tree):
+    """Return the nodes of the tree if it is a single path, else None"""
+    path = single_prefix_path(tree)
+    if len(path) != 0 and len(path[-1]._children) != 0:
+        return None
+    if len(path) == 0 and len(tree.root._children) != 0:
+        return None
+    return path
+
+def is_subsumed(itemset, itemsets):
+    """Check if an itemset is a subset of one of the given itemsets"""
+    for other in itemsets:
+        if itemset <= other:
+            return True
+    return False
+
+def fp_closed(tree, min_count):
+    """ 
+    Mine the closed frequent patterns of an FPTree, the patterns that have
+    no superpattern with the same support (CLOSET). The tree must be built
+    with its items sorted by descending support and then by item. Return
+    a dictionary mapping every closed pattern to its support.
+    """
+    closed = defaultdict(list)
+    closet_extend(tree, frozenset(), min_count, closed)
+    patterns = {}
+    for support, itemsets in closed.iteritems():
+        for itemset in itemsets:
+            patterns[itemset] = support
+    return patterns
+
+def closet_extend(tree, suffix, min_count, closed):
+    """
+    Grow suffix by every frequent item of the tree, least frequent first.
+    Items that occur in every transaction of the new pattern are merged
+    into it, and a pattern contained in an already found closed pattern 
+    with the same support is not extended further.
+    """
+    items = item_supports(tree, suffix)
+    items.sort(key=lambda x: (-x[1], x[0]), reverse=True)
+    for item, support in items:
+        if support < min_count:
+            continue
+        beta = suffix | frozenset([item])
+        cond_tree = conditional_fptree(tree.prefix_paths(item), min_count)
+        beta = beta.union(x for x, s in item_supports(cond_tree, beta)
+                          if s == support)
+        if is_subsumed(beta, closed[support]):
+            continue
+        closed[support].append(beta)
+        closet_extend(cond_tree, beta, min_count, closed)
+
+def fp_max(tree, min_count):
+    """ 
+    Mine the maximal frequent patterns of an FPTree, the patterns that 
+    have no frequent superpattern (FPMax). The tree must be built with its
+    items sorted by descending support and then by item. Return a 
+    dictionary mapping every maximal pattern to its support.
+    """
+    maximal = {}
+    fpmax_extend(tree, frozenset(), min_count, maximal)
+    return maximal
+
+def fpmax_extend(tree, suffix, min_count, maximal):
+    """
+    Grow suffix by every frequent item of the tree, least frequent first.
+    A tree whose items together with the suffix are contained in a 
+    maximal pattern is skipped, and a single path tree yields its only
+    maximal pattern directly.
+    """
+    items = [(item, support) for item, support in item_supports(tree, suffix)
+             if support >= min_count]
+    # An empty tree, or one without a frequent item, adds no pattern
+    if len(items) == 0:
+        return
+    if is_subsumed(suffix.union(item for item, s in items), maximal):
+        return
+    path = single_path(tree)
+    if path is not None:
+        nodes = [node for node in path 
+                 if node.item not in suffix and node.count >= min_count]
+        beta = suffix.union(node.item for node in nodes)
+        if not is_subsumed(beta, maximal):
+            maximal[beta] = nodes[-1].count
+        return
+    items.sort(key=lambda x: (-x[1], x[0]), reverse=True)
+    for item, support in items:
+        beta = suffix | frozenset([item])
+        cond_tree = conditional_fptree(tree.prefix_paths(item), min_count)
+        if any(s >= min_count for x, s in item_supports(cond_tree, beta)):
+            fpmax_extend(cond_tree, beta, min_count, maximal)
+        elif not is_subsumed(beta, maximal):
+            maximal[beta] = support
+
+def fp_topk(tree, k, min_len=1):
+    """ 
+    Mine the k most frequent patterns of an FPTree that have at least 
+    min_len items, without a minimum support. The k best patterns found so
+    far are kept in a min-heap whose smallest support is the border a 
+    pattern has to beat, so the border rises while the tree is mined and
+    conditional trees below it are never built. Return a dictionary 
+    mapping every pattern to its support.
+    """
+    if k < 1:
+        raise ValueError("k must be at least 1.")
+    heap = []
+    topk_extend(tree, frozenset(), k, min_len, heap)
+    return dict((itemset, support) for support, itemset in heap)
+
+class FPWindow(object):
+    """
+    An FP tree over the last `size` transactions of a stream. Items are 
+    inserted in their natural sort order, which unlike a support order 
+    stays valid while the window moves, so expired transactions can be 
+    removed from the tree along the same path they were added by.
+    """
     
-    for path in paths:
-        if suffix_item is None:
-            suffix_item = path[-1].item
+    def __init__(self, size):
+        self.size = size
+        self.tree = FPTree()
+        self._window = deque()
         
-        point = tree.root        
-        for node in path:
-            next_point = point.search(node.item)
-            if not next_point:
-                if node.item == suffix_item:
-                    count = node.count
-                else: 
-                    count = 0
-                next_point = FPNode(tree, node.item, count)
-                point.add(next_point)
-                tree._update_links(next_point)
-            point = next_point
-    assert suffix_item is not None
-    for path in tree.prefix_paths(suffix_item):
-        count = path[-1].count
-        for node in reversed(path[:-1]):
-            node._count += count        
-    return tree
+    def __len__(self):
+        return len(self._window)
+        
+    def add(self, transaction):
+        """Add a transaction and expire the oldest one if the window is 
+        full."""
+        transaction = sorted(transaction)
+        self._window.append(transaction)
+        self.tree.add(transaction)
+        if len(self._window) > self.size:
+            self.tree.remove(self._window.popleft())
+            
+    def frequent_patterns(self, min_sup):
+        """Return the frequent patterns of the current window and their 
+        supports."""
+        patterns = {}
+        for itemset, sup in fp_growth(self.tree, [], min_sup, len(self)):
+            patterns[frozenset(itemset)] = sup
+        return patterns
+
+def topk_border(heap, k):
+    """Return the support a pattern has to exceed to enter the heap"""
+    if len(heap) < k:
+        return 0
+    return heap[0][0]
+
+def topk_extend(tree, suffix, k, min_len, heap):
+    """
+    Grow suffix by every item of the tree, most frequent first. All the
+    new patterns are offered to the heap before any conditional tree is
+    mined, which raises the border as early as possible.
+    """
+    items = item_supports(tree, suffix)
+    items.sort(key=lambda x: x[1], reverse=True)
+    if len(suffix) + 1 >= min_len:
+        for item, support in items:
+            if support <= topk_border(heap, k):
+                break
+            beta = suffix | frozenset([item])
+            if len(heap) < k:
+                heapq.heappush(heap, (support, beta))
+            else:
+                heapq.heapreplace(heap, (support, beta))
+    for item, support in items:
+        # No superpattern of beta can beat the border
+        if support <= topk_border(heap, k):
+            break
+        beta = suffix | frozenset([item])
+        cond_tree = conditional_fptree(tree.prefix_paths(item),
+                                       topk_border(heap, k) + 1)
+        topk_extend(cond_tree, beta, k, min_len, heap)
+
+def mine_base(task):
+    """Mine the conditional pattern base of one item in a worker process.
+    Return the frequent patterns that contain the item and their 
+    supports."""
+    item, base, min_sup, n_transactions = task
+    cond_tree = base_fptree(base, min_sup*n_transactions)
+    patterns = {}
+    for itemset, sup in fp_growth(cond_tree, [item], min_sup, n_transactions):
+        patterns[frozenset(itemset)] = sup
+    return patterns
+
+def fp_growth_parallel(tree, min_sup, n_transactions, processes=None):
+    """ 
+    Mine an FPTree like fp_growth, with the conditional pattern base of 
+    every item of the tree mined in a process pool. Bases are sent to the
+    workers as lists of item paths, the largest ones first so that no 
+    worker is left with a big one at the end. Return a dictionary mapping
+    every frequent pattern to its support.
+    """
+    min_count = min_sup*n_transactions
+    patterns = {}
+    path = single_prefix_path(tree)
+    for itemset, sup in prefix_path_patterns(path, [], min_count):
+        patterns[frozenset(itemset)] = sup
+    path_items = set(node.item for node in path)
+    
+    tasks = []
+    for item, nodes in tree.items():
+        if item in path_items:
+            continue
+        support = sum(n.count for n in nodes)
+        if support >= min_count:
+            patterns[frozenset([item])] = support
+            base = conditional_base(tree.prefix_paths(item))
+            tasks.append((item, base, min_sup, n_transactions))
+    tasks.sort(key=lambda task: sum(len(items) for items, count in task[1]),
+               reverse=True)
+    
+    if processes is None:
+        processes = multiprocessing.cpu_count()
+    pool = multiprocessing.Pool(processes)
+    try:
+        for result in pool.imap_unordered(mine_base, tasks):
+            patterns.update(result)
+    finally:
+        pool.close()
+        pool.join()
+    return patterns
 
 ##################################################################
 # DATA PROCESSING
@@ -376,11 +841,36 @@ keys = ['age','workclass','education','marital','occupation',\
 ##################################################################
 # APRIORI IMPLEMENTATION
 ##################################################################
+# Mine only the top_k most frequent patterns with at least min_length 
+# items instead of the patterns above a minimum support, None to disable
+top_k = None
+min_length = 1
+
 # Prompts user for minimum support and minimum confidence
-min_sup = input("Input minimum support [0..1]= ")
+if top_k is None:
+    min_sup = input("Input minimum support [0..1]= ")
+else:
+    min_sup = 0
 min_conf = input("Input minimum confidence [0..1]= ")
 print "Processing... \n"
 
+# Patterns to mine: 'all' frequent patterns, only the 'closed' ones or
+# only the 'maximal' ones
+mining = 'all'
+
+# Mine only the last window_size records with a sliding window over the
+# records in their original order, None mines all records
+window_size = None
+
+# Directory of the result cache of frequent patterns, None to always 
+# mine, and the maximum size of the cache in bytes
+cache_dir = None
+cache_bytes = 64*2**20
+
+# Number of worker processes that mine the conditional pattern bases of 
+# the tree items in parallel, None mines in this process
+processes = None
+
 # Record start time 
 start = datetime.datetime.now()
 
@@ -393,33 +883,79 @@ for row in data1:
         temp.append('%s=%s'%(keys[i],item))
     transactions.append(temp)
 
+# Encode every attribute=value item as a dense integer id, item names
+# are only looked up again when the results are printed
+transactions, item_names = encode_transactions(transactions)
+
+# Collapse identical transactions into (transaction, count) pairs, the 
+# records keep their order for the sliding window
+n_transactions = len(transactions)
+records = transactions
+transactions = dedup_transactions(transactions)
+
 # Scan the transaction database D once and collect the set of 
 # frequent items and their support counts.
 freq_items = defaultdict(int)
-for transaction in transactions:
+for transaction, count in transactions:
     for item in transaction:
-        freq_items[item] += 1
+        freq_items[item] += count
         
 # Remove infrequent items
 for item, f in freq_items.items():
-    if float(f)/len(transactions) < min_sup:
+    if float(f)/n_transactions < min_sup:
         del freq_items[item]   
 
+# Position of every frequent item in descending support order
+rank = {}
+for i, item in enumerate(sorted(freq_items, key=lambda x: (-freq_items[x],x))):
+    rank[item] = i
+
 # Sorted each transaction in T according to the order of freq_items and 
 #insert the transaction into an FPTree
 Tree = FPTree()
-for transaction in transactions:
+for transaction, count in transactions:
     temp = []
     for item in transaction:
         if item in freq_items.keys():
             temp.append(item)
-    temp.sort(key=lambda x: freq_items[x],reverse = True)
-    Tree.add(temp)
+    temp.sort(key=lambda x: rank[x])
+    Tree.add(temp, count)
 
 # Mining the tree
-freq_patterns = defaultdict(int)
-for itemset, sup in fp_growth(Tree,[],min_sup,transactions):
-    freq_patterns[frozenset(itemset)] = sup
+if window_size is not None:
+    window = FPWindow(window_size)
+    for transaction in records:
+        window.add(transaction)
+    freq_patterns = window.frequent_patterns(min_sup)
+elif top_k is not None:
+    freq_patterns = fp_topk(Tree,top_k,min_length)
+elif mining == 'closed':
+    freq_patterns = fp_closed(Tree,min_sup*n_transactions)
+elif mining == 'maximal':
+    freq_patterns = fp_max(Tree,min_sup*n_transactions)
+elif processes is not None:
+    freq_patterns = fp_growth_parallel(Tree,min_sup,n_transactions,processes)
+elif cache_dir is not None:
+    # Answer from the result cache when it was mined at a min_sup no 
+    # higher than this one, otherwise mine and replace the cache entry
+    key = cache_key(transactions,item_names)
+    cached = load_cache(cache_dir,key,item_names)
+    if cached is not None and cached[0] <= min_sup:
+        freq_patterns = {}
+        for itemset, sup in cached[1].iteritems():
+            if float(sup)/n_transactions >= min_sup:
+                freq_patterns[itemset] = sup
+        print "Patterns taken from the cache.\n"
+    else:
+        freq_patterns = defaultdict(int)
+        for itemset, sup in fp_growth(Tree,[],min_sup,n_transactions):
+            freq_patterns[frozenset(itemset)] = sup
+        save_cache(cache_dir,key,min_sup,freq_patterns,item_names,
+                   cache_bytes)
+else:
+    freq_patterns = defaultdict(int)
+    for itemset, sup in fp_growth(Tree,[],min_sup,n_transactions):
+        freq_patterns[frozenset(itemset)] = sup
 
 # Record finish time
 finish = datetime.datetime.now()
@@ -427,7 +963,7 @@ finish = datetime.datetime.now()
 # Show results
 print "List of frequent patterns:"
 for item, f in freq_patterns.items():
-    print "{}, support: {}\n".format(list(item),f)
+    print "{}, support: {}\n".format(decode_itemset(item,item_names),f)
 
 # Showing time spent
 print "The operation took {}.".format(finish-start)
@@ -452,12 +988,15 @@ ms = float(2)/9
 # minimum confidence
 mc = 0.7
 
+# Collapse identical transactions into (transaction, count) pairs
+D = dedup_transactions(T)
+
 f_items = defaultdict(int)
 
 # Generate list of items
-for t in T:
+for t, count in D:
     for item in t:
-        f_items[item] += 1
+        f_items[item] += count
 
 # Remove infrequent items
 for item, f in f_items.items():
@@ -467,18 +1006,21 @@ for item, f in f_items.items():
 # Sorted each transaction in T according to the order of f_items and insert
 # the transaction into an FPTree
 Tree = FPTree()
-for t in T:
+for t, count in D:
     temp = []
     for item in t:
         if item in f_items.keys():
             temp.append(item)
     temp.sort(key=lambda x: f_items[x], reverse=True)
-    Tree.add(temp)
+    Tree.add(temp, count)
 
 # Mining the tree
 freq_patterns = defaultdict(int) # freq patterns and their supports
-for itemset, sup in fp_growth(Tree, [], ms, T):
+for itemset, sup in fp_growth(Tree, [], ms, len(T)):
     freq_patterns[frozenset(itemset)] = sup
+
+# A tree without frequent items has no maximal patterns
+print "Maximal patterns of an empty tree: {0}\n".format(fp_max(FPTree(), 1))
     
 
 